@@ -1,22 +1,78 @@
 # backend/app/__init__.py
+import logging
+import os
+import time
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
+
 from .config import Config
+from .database import (
+    dispose_engines_after_fork, init_read_session, install_sqlite_pragmas, run_in_forked_child,
+)
+from .media import check_media_offload
 
 db = SQLAlchemy()
+# Catalog reads go through this session; everything that writes, and the cart
+# (which must see the user's own writes), stays on db.session. create_app()
+# binds it to its own engine.
+read_session = db.create_scoped_session()
+
+logger = logging.getLogger(__name__)
 
-def create_app():
+def create_app(config=Config):
+    """Build the application.
+
+    Nothing here touches the database or starts threads or processes, so
+    the app can be built once in a prefork master (gunicorn --preload) and
+    shared copy-on-write by the workers. Schema setup is `flask init-db`.
+    """
+    started = time.perf_counter()
     app = Flask(__name__)
-    app.config.from_object(Config)
-    
-    CORS(app)
+    app.config.from_object(config)
+
+    if app.config['TRUSTED_PROXIES']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
+    CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}})
     db.init_app(app)
-    
-    from .routes import api
-    app.register_blueprint(api)
-    
-    with app.app_context():
-        db.create_all()
-    
-    return app
\ No newline at end of file
+    install_sqlite_pragmas(db.get_engine(app), app.config['SQLITE_PRAGMAS'])
+    init_read_session(read_session, db, app)
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    check_media_offload(app.config['MEDIA_OFFLOAD'])
+
+    from .admission import admission
+    from .auth import auth_cache
+    from .cartstore import init_cart_store
+    from .catalog import catalog_cache
+    from .maintenance import maintenance
+    from .metrics import metrics
+    from .passwords import hash_pool
+    from .productindex import product_index
+    from .related import related_rebuilder
+    from .uploads import reset_image_pool
+    from .routes import register_blueprints
+    from .commands import register_commands
+
+    auth_cache.init_app(app)
+    catalog_cache.init_app(app)
+    hash_pool.init_app(app)
+    cart_store = init_cart_store(app)
+    metrics.init_app(app, engines=(db.get_engine(app), app.extensions['read_engine']))
+    # After metrics, so refused requests are still counted and timed.
+    admission.init_app(app, db.get_engine(app))
+    maintenance.init_app(app)
+    product_index.init_app(app)
+    register_blueprints(app)
+    register_commands(app)
+
+    # Forked workers must not share the master's pooled connections or
+    # executors; each gets its own on first use.
+    dispose_engines_after_fork(db, app)
+    run_in_forked_child(hash_pool.reset, reset_image_pool, cart_store.reset,
+                        related_rebuilder.reset, maintenance.reset, product_index.reset)
+
+    app.extensions['startup_seconds'] = time.perf_counter() - started
+    logger.debug('create_app took %.1f ms', app.extensions['startup_seconds'] * 1000)
+    return app
@@ -0,0 +1,176 @@
+# backend/app/admission.py
+# Admission control, checked before any view runs:
+#
+#   - each client gets a token bucket per request class (read, write, auth):
+#     signed-in users by user id, everyone else, and every auth request,
+#     by IP. An empty bucket is a 429 with Retry-After.
+#   - the process sheds load with a 503 when too many requests are in
+#     flight, or (for writes) when write statements have slowed down,
+#     which on SQLite means requests are queueing for the write lock.
+#
+# All state is in process memory and each check is a few dict operations;
+# nothing here touches the database.
+from collections import OrderedDict
+import math
+import threading
+import time
+
+import jwt
+from flask import current_app, g, jsonify, request
+from sqlalchemy import event
+
+from app.auth import PrincipalCache, auth_cache
+from app.metrics import metrics
+
+EXEMPT_BLUEPRINTS = ('monitoring',)  # /metrics must answer even when we shed
+WRITE_LATENCY_WEIGHT = 0.2  # of the newest write statement in the moving average
+WRITE_LATENCY_HALF_LIFE = 1.0  # seconds; how fast the average fades once writes stop
+
+class TokenBuckets:
+    """Token buckets by key: ``rate`` tokens a second, holding at most ``burst``.
+
+    Only the ``maxsize`` most recently seen keys are kept; a forgotten key
+    comes back with a full bucket.
+    """
+
+    def __init__(self, rate, burst, maxsize=100000):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Take a token; return 0 if one was available, else seconds until one is."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / self.rate
+
+class Admission:
+    def __init__(self):
+        self.enabled = False
+        self.max_in_flight = 0
+        self.shed_write_latency = 0.0
+        self._buckets = {}
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._write_latency = 0.0
+        self._write_latency_at = 0.0
+
+    def init_app(self, app, engine):
+        self.enabled = app.config['RATE_LIMIT_ENABLED']
+        self.max_in_flight = app.config['MAX_IN_FLIGHT_REQUESTS']
+        self.shed_write_latency = app.config['SHED_WRITE_LATENCY_MS'] / 1000.0
+        self._buckets = {
+            request_class: TokenBuckets(rate, burst, app.config['RATE_LIMIT_MAX_CLIENTS'])
+            for request_class, (rate, burst) in app.config['RATE_LIMITS'].items()
+        }
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def write_latency(self):
+        """Moving average of write statement time, faded by how long writes have been idle."""
+        idle = time.monotonic() - self._write_latency_at
+        return self._write_latency * 0.5 ** (idle / WRITE_LATENCY_HALF_LIFE)
+
+    # Request hooks
+
+    def _before_request(self):
+        if not self.enabled or request.method == 'OPTIONS' or request.blueprint in EXEMPT_BLUEPRINTS:
+            return None
+        request_class = classify(request)
+
+        with self._in_flight_lock:
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                shed = 'in_flight'
+            else:
+                shed = None
+                self._in_flight += 1
+                g.admission_counted = True
+        if shed is None and request_class != 'read' and self.shed_write_latency \
+                and self.write_latency >= self.shed_write_latency:
+            shed = 'write_latency'
+        if shed is not None:
+            return self._reject(request_class, shed, 503, 'Server is busy, please retry', 1)
+
+        buckets = self._buckets.get(request_class)
+        if buckets is not None:
+            wait = buckets.take(client_key(request_class))
+            if wait:
+                return self._reject(request_class, 'rate_limit', 429, 'Too many requests', wait)
+        return None
+
+    def _teardown_request(self, exc):
+        if g.pop('admission_counted', False):
+            with self._in_flight_lock:
+                self._in_flight -= 1
+
+    def _reject(self, request_class, reason, status, message, retry_after):
+        metrics.inc('http_requests_rejected_total', (('class', request_class), ('reason', reason)))
+        response = jsonify({'message': message})
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    # SQL hooks
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('admission_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['admission_started'].pop()
+        if statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            # Unlocked: a lost update only nudges an estimate.
+            self._write_latency = (self.write_latency * (1 - WRITE_LATENCY_WEIGHT)
+                                   + elapsed * WRITE_LATENCY_WEIGHT)
+            self._write_latency_at = time.monotonic()
+
+admission = Admission()
+metrics.describe('http_requests_rejected_total', 'counter',
+                 'Requests refused by rate limits (429) or load shedding (503).')
+
+def classify(req):
+    if req.blueprint == 'auth':
+        return 'auth'
+    if req.method in ('GET', 'HEAD'):
+        return 'read'
+    return 'write'
+
+def client_key(request_class):
+    """The user id behind a valid bearer token, else the client's address.
+
+    Auth requests are always counted by address: that's where password
+    guessing comes from. The token is checked against the auth cache, or
+    by its signature alone, never against the database.
+    """
+    header = request.headers.get('Authorization')
+    if header and request_class != 'auth':
+        token = header.split()[-1]
+        principal = auth_cache.peek(PrincipalCache.digest(token))
+        if principal is not None:
+            return 'user', principal.id
+        try:
+            claims = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+            return 'user', claims['user_id']
+        except (jwt.InvalidTokenError, KeyError):
+            pass
+    return 'ip', request.remote_addr
@@ -0,0 +1,264 @@
+# backend/app/asgi.py
+# Asyncio server for the hottest read paths: GET /api/products, GET /api/cart
+# and GET /uploads/<filename>. It uses the same models, query builders and
+# payloads as the Flask views, run through SQLAlchemy's asyncio extension on
+# aiosqlite, so one process can keep thousands of idle keep-alive clients.
+# Everything else, including every write, stays on the Flask app; route these
+# three GETs here at the proxy.
+import asyncio
+import logging
+import os
+import time
+
+import anyio
+import jwt
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, JSONResponse, Response
+from starlette.routing import Route
+
+from app.auth import AUTH_VERSION_QUERY, Principal, PrincipalCache
+from app.cart import cart_payload, cart_statement
+from app.catalog import (
+    CATALOG_VERSION_QUERY, CatalogCache, negotiate_snapshot, product_list_params,
+    product_page_payload, product_page_statement,
+)
+from app.config import Config
+from app.database import install_sqlite_pragmas
+from app.media import (
+    check_media_offload, is_not_modified, media_etag, media_headers, media_type, offload_header,
+    parse_byte_range,
+)
+from app.models import User
+from app.productindex import PRODUCT_INDEX_QUERY, ProductIndex
+
+logger = logging.getLogger(__name__)
+
+class UploadResponse(FileResponse):
+    """A file from UPLOAD_FOLDER: all of it, or the inclusive (start, end) byte_range."""
+    chunk_size = 64 * 1024  # each read is a hop to a worker thread
+
+    def __init__(self, path, stat_result, method, headers, byte_range=None):
+        self.byte_range = byte_range
+        status_code = 200
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers = dict(headers, **{
+                'Content-Range': 'bytes %d-%d/%d' % (start, end, stat_result.st_size),
+                'Content-Length': str(end - start + 1),
+            })
+        super().__init__(path, status_code=status_code, headers=headers,
+                         media_type=media_type(path), stat_result=stat_result, method=method)
+
+    async def __call__(self, scope, receive, send):
+        if self.byte_range is None:
+            await super().__call__(scope, receive, send)
+            return
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+        if self.send_header_only:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return
+        start, end = self.byte_range
+        remaining = end - start + 1
+        async with await anyio.open_file(self.path, mode='rb') as file:
+            await file.seek(start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                # A file truncated under us ends the body early rather than hanging.
+                remaining = remaining - len(chunk) if chunk else 0
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+
+def create_async_read_engine(url, config):
+    """A read-only async engine for url, with the sync app's pool and PRAGMAs."""
+    url = make_url(url)
+    if url.drivername in ('sqlite', 'sqlite+pysqlite'):
+        url = url.set(drivername='sqlite+aiosqlite')
+    options = config['SQLALCHEMY_ENGINE_OPTIONS']
+    engine = create_async_engine(
+        url,
+        # aiosqlite would otherwise get NullPool for a file database.
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=options.get('pool_size', 10),
+        max_overflow=options.get('max_overflow', 10),
+        pool_timeout=options.get('pool_timeout', 30),
+    )
+    install_sqlite_pragmas(engine.sync_engine, config['SQLITE_PRAGMAS'], read_only=True)
+    return engine
+
+def create_asgi_app(config=Config):
+    config = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    check_media_offload(config['MEDIA_OFFLOAD'])
+    primary_url = config['SQLALCHEMY_DATABASE_URI']
+    primary = create_async_read_engine(primary_url, config)
+    # Catalog reads may go to a replica; the cart must read the primary to
+    # see the user's own writes.
+    if config.get('READ_DATABASE_URL') and config['READ_DATABASE_URL'] != primary_url:
+        catalog = create_async_read_engine(config['READ_DATABASE_URL'], config)
+    else:
+        catalog = primary
+
+    async def dispose_engines():
+        await primary.dispose()
+        if catalog is not primary:
+            await catalog.dispose()
+
+    async def start_product_index():
+        refresh_product_index(app, None)
+
+    app = Starlette(routes=[
+        Route('/api/products', get_products, methods=['GET']),
+        Route('/api/cart', get_cart, methods=['GET']),
+        Route('/uploads/{filename}', uploaded_file, methods=['GET', 'HEAD']),
+    ], exception_handlers={PoolTimeout: busy}, on_startup=[start_product_index],
+        on_shutdown=[dispose_engines])
+    app.state.config = config
+    app.state.session = sessionmaker(primary, class_=AsyncSession, expire_on_commit=False)
+    app.state.catalog_session = sessionmaker(catalog, class_=AsyncSession, expire_on_commit=False)
+    # Writes happen in other processes; the auth_meta version tells us when
+    # a user was demoted or deleted, as it does any one worker of the Flask app.
+    app.state.auth_cache = PrincipalCache(config['AUTH_CACHE_SIZE'], config['AUTH_CACHE_TTL'],
+                                          config['AUTH_VERSION_TTL'])
+    app.state.catalog_cache = CatalogCache(config['CATALOG_CACHE_SIZE'], config['CATALOG_VERSION_TTL'])
+    app.state.product_index = ProductIndex()
+    app.state.product_index.enabled = config['PRODUCT_INDEX_ENABLED']
+    app.state.product_index_loads = set()
+    return app
+
+def refresh_product_index(app, version):
+    """Reload the product index in the background if it is older than version."""
+    index = app.state.product_index
+    if index.enabled and index.claim_load(version):
+        task = asyncio.get_running_loop().create_task(load_product_index(app))
+        # The loop only keeps a weak reference to its tasks.
+        app.state.product_index_loads.add(task)
+        task.add_done_callback(app.state.product_index_loads.discard)
+
+async def load_product_index(app):
+    index = app.state.product_index
+    started = time.perf_counter()
+    try:
+        async with app.state.catalog_session() as session:
+            version = (await session.execute(CATALOG_VERSION_QUERY)).scalar()
+            rows = (await session.execute(PRODUCT_INDEX_QUERY)).all()
+        # Sorting the columns takes a while; keep the loop serving meanwhile.
+        await anyio.to_thread.run_sync(index.replace, version, rows, started)
+    except Exception as e:
+        logger.exception('Loading the product index failed')
+        index.load_failed(e, started)
+
+def message(text, status):
+    return JSONResponse({'message': text}, status_code=status)
+
+async def busy(request, exc):
+    # Every pooled connection stayed busy for pool_timeout: shed the request
+    # the way the Flask app does when its hash pool is full.
+    response = message('Server is busy, please retry', 503)
+    response.headers['Retry-After'] = '1'
+    return response
+
+async def authenticate(request):
+    """Resolve the request's bearer token to a Principal, or None."""
+    header = request.headers.get('Authorization')
+    if not header:
+        return None
+    cache = request.app.state.auth_cache
+    if cache.version_is_stale():
+        async with request.app.state.session() as session:
+            cache.set_version((await session.execute(AUTH_VERSION_QUERY)).scalar())
+    try:
+        token = header.split()[1]  # Remove 'Bearer' prefix
+        digest = PrincipalCache.digest(token)
+        cached = cache.get(digest)
+        if cached is not None:
+            return cached[1]
+        data = jwt.decode(token, request.app.state.config['SECRET_KEY'], algorithms=["HS256"])
+        user_id = data['user_id']
+    except (IndexError, KeyError, jwt.InvalidTokenError):
+        return None
+    async with request.app.state.session() as session:
+        user = (await session.execute(
+            select(User.id, User.is_admin).where(User.id == user_id)
+        )).first()
+    if user is None:
+        return None
+    principal = Principal(id=user.id, is_admin=bool(user.is_admin))
+    cache.put(digest, data, principal)
+    return principal
+
+def auth_error(request):
+    if not request.headers.get('Authorization'):
+        return message('Token is missing', 401)
+    return message('Token is invalid', 401)
+
+async def get_products(request):
+    if await authenticate(request) is None:
+        return auth_error(request)
+    try:
+        params = product_list_params(request.query_params)
+        statement = product_page_statement(**params)
+    except ValueError as e:
+        return message(str(e), 400)
+
+    cache = request.app.state.catalog_cache
+    page_key = tuple(params.values())
+    async with request.app.state.catalog_session() as session:
+        if cache.version_is_stale():
+            cache.set_version((await session.execute(CATALOG_VERSION_QUERY)).scalar())
+        version = cache.version
+        snapshot = cache.get(version, page_key)
+        if snapshot is None:
+            products = request.app.state.product_index.page(version, **params)
+            if products is None:
+                refresh_product_index(request.app, version)
+                products = (await session.execute(statement)).all()
+            snapshot = cache.put(version, page_key, product_page_payload(
+                products, params['sort'], params['limit']))
+
+    status, body, headers = negotiate_snapshot(
+        snapshot, request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding'))
+    if status == 304:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+async def get_cart(request):
+    principal = await authenticate(request)
+    if principal is None:
+        return auth_error(request)
+    async with request.app.state.session() as session:
+        rows = (await session.execute(cart_statement(principal.id))).all()
+    return JSONResponse(cart_payload(rows))
+
+async def uploaded_file(request):
+    filename = request.path_params['filename']
+    if os.path.basename(filename) != filename or filename.startswith('.'):
+        return message('Not found', 404)
+    path = os.path.join(request.app.state.config['UPLOAD_FOLDER'], filename)
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    except OSError:
+        return message('Not found', 404)
+
+    config = request.app.state.config
+    headers = media_headers(filename, stat_result, config['MEDIA_MAX_AGE'])
+    etag = media_etag(filename, stat_result)
+    if is_not_modified(request.headers.get('if-none-match'), request.headers.get('if-modified-since'),
+                       etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+    offload = offload_header(config['MEDIA_OFFLOAD'], config['MEDIA_ACCEL_LOCATION'],
+                             config['UPLOAD_FOLDER'], filename)
+    if offload is not None:
+        headers[offload[0]] = offload[1]
+        return Response(headers=headers, media_type=media_type(filename))
+
+    byte_range = None
+    if request.headers.get('if-range', '"%s"' % etag) == '"%s"' % etag:
+        byte_range = parse_byte_range(request.headers.get('range'), stat_result.st_size)
+    if byte_range is False:
+        return Response(status_code=416, headers={'Content-Range': 'bytes */%d' % stat_result.st_size})
+    return UploadResponse(path, stat_result, request.method, headers, byte_range)
@@ -0,0 +1,203 @@
+# backend/app/auth.py
+from collections import OrderedDict, namedtuple
+from functools import wraps
+import hashlib
+import threading
+import time
+
+import jwt
+from flask import current_app, jsonify, request
+from sqlalchemy import event, select, text
+
+from app import db
+from app.metrics import timed
+from app.models import AuthMeta, User
+
+AUTH_VERSION_QUERY = select(AuthMeta.version).where(AuthMeta.id == 1)
+# The ORM events below only see this process's ORM writes; these catch the
+# rest (bulk and raw SQL updates, other workers). Password changes, such as
+# the rehash on login, don't change what a principal holds.
+AUTH_VERSION_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS user_auth_au AFTER UPDATE OF id, is_admin ON "user"
+    WHEN old.id IS NOT new.id OR old.is_admin IS NOT new.is_admin BEGIN
+        UPDATE auth_meta SET version = version + 1 WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_auth_ad AFTER DELETE ON "user" BEGIN
+        UPDATE auth_meta SET version = version + 1 WHERE id = 1;
+    END""",
+)
+
+def create_auth_triggers():
+    if AuthMeta.query.get(1) is None:
+        db.session.add(AuthMeta(id=1, version=0))
+    for statement in AUTH_VERSION_TRIGGERS:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+# What the protected views get as current_user: enough to authorize the
+# request without keeping an ORM object (and its session) around.
+Principal = namedtuple('Principal', ['id', 'is_admin'])
+
+class PrincipalCache:
+    """Bounded LRU of verified tokens, keyed by token digest.
+
+    An entry lives for at most ``ttl`` seconds and never past the token's own
+    ``exp`` claim, so a hit is exactly as trustworthy as re-verifying the token.
+    Entries for a user are dropped as soon as this process changes that user
+    row. Changes made anywhere else bump the auth_meta version, which is
+    re-read at most once every ``version_ttl`` seconds; a new version drops
+    every entry.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300, version_ttl=1.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # digest -> (expires_at, claims, principal)
+        self._by_user = {}  # user id -> set of digests
+        self._version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.maxsize = app.config['AUTH_CACHE_SIZE']
+        self.ttl = app.config['AUTH_CACHE_TTL']
+        self.version_ttl = app.config['AUTH_VERSION_TTL']
+
+    def version_is_stale(self):
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.version_ttl
+
+    def set_version(self, version):
+        """Record the version just read from auth_meta."""
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._by_user.clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.time():
+                self._discard(digest)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def peek(self, digest):
+        """The cached principal, if any, without touching recency or the hit counts."""
+        entry = self._entries.get(digest)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[2]
+
+    def put(self, digest, claims, principal):
+        expires_at = time.time() + self.ttl
+        if 'exp' in claims:
+            expires_at = min(expires_at, claims['exp'])
+        with self._lock:
+            self._discard(digest)
+            self._entries[digest] = (expires_at, claims, principal)
+            self._by_user.setdefault(principal.id, set()).add(digest)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for digest in list(self._by_user.get(user_id, ())):
+                self._discard(digest)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _discard(self, digest):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        digests = self._by_user.get(entry[2].id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[entry[2].id]
+
+auth_cache = PrincipalCache()
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_principal(mapper, connection, target):
+    auth_cache.invalidate_user(target.id)
+
+def authenticate(header):
+    """Resolve an Authorization header to a Principal, or raise."""
+    with timed('auth'):
+        token = header.split()[1]  # Remove 'Bearer' prefix
+        if auth_cache.version_is_stale():
+            auth_cache.set_version(db.session.execute(AUTH_VERSION_QUERY).scalar())
+        digest = PrincipalCache.digest(token)
+        cached = auth_cache.get(digest)
+        if cached is not None:
+            return cached[1]
+
+        with timed('jwt'):
+            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+        user = User.query.get(data['user_id'])
+        if user is None:
+            raise LookupError('Unknown user')
+        principal = Principal(id=user.id, is_admin=bool(user.is_admin))
+        auth_cache.put(digest, data, principal)
+        return principal
+
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            return jsonify({'message': 'Token is missing'}), 401
+
+        try:
+            current_user = authenticate(token)
+        except:
+            return jsonify({'message': 'Token is invalid'}), 401
+
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+def admin_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            return jsonify({'message': 'Token is missing'}), 401
+
+        try:
+            current_user = authenticate(token)
+        except:
+            return jsonify({'message': 'Token is invalid'}), 401
+        if not current_user.is_admin:
+            return jsonify({'message': 'Admin privileges required'}), 403
+
+        return f(current_user, *args, **kwargs)
+    return decorated
@@ -0,0 +1,248 @@
+# backend/app/bulk.py
+# Bulk import / export of the product catalog, shared by the HTTP endpoints
+# and the `flask import-products` / `flask export-products` commands, and
+# set-based bulk updates (repricing, image swaps) for the admin endpoint.
+from datetime import datetime
+import csv
+import io
+import json
+import math
+
+from sqlalchemy import select, text
+
+from app import db, read_session
+from app.catalog import bump_catalog_version, catalog_cache, fts_query, name_prefix_upper_bound
+from app.jsonstream import dumps
+from app.models import Product
+from app.uploads import thumbnails_for_image
+
+IMPORT_BATCH_SIZE = 1000  # rows per executemany + commit
+MAX_IMPORT_ERRORS = 100  # per-row errors echoed back; the rest are only counted
+EXPORT_BATCH_SIZE = 1000
+PRODUCT_EXPORT_FIELDS = ('id', 'name', 'price', 'image', 'created_at')
+MAX_BULK_UPDATE_IDS = 100000
+BULK_UPDATE_FILTERS = ('ids', 'min_price', 'max_price', 'prefix', 'q', 'all')
+
+def parse_import_rows(lines, fmt):
+    """Yield (line number, dict or None, error) for each record in lines."""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, 'Invalid JSON'
+            continue
+        if not isinstance(row, dict):
+            yield number, None, 'Expected a JSON object'
+            continue
+        yield number, row, None
+
+def validate_product_row(row):
+    """Return insert values for an imported row, or raise ValueError."""
+    name = row.get('name')
+    if name is not None and not isinstance(name, str):
+        raise ValueError('Name must be a string')
+    name = (name or '').strip()
+    if not name:
+        raise ValueError('Missing name')
+    if len(name) > 100:
+        raise ValueError('Name is longer than 100 characters')
+    price = row.get('price')
+    if isinstance(price, bool):
+        raise ValueError('Invalid price')
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid price')
+    if not math.isfinite(price) or price < 0:
+        raise ValueError('Invalid price')
+    image = row.get('image')
+    if image is not None and not isinstance(image, str):
+        raise ValueError('Image must be a string')
+    image = image or ''
+    if len(image) > 500:
+        raise ValueError('Image is longer than 500 characters')
+    return {'name': name, 'price': price, 'image': image, 'created_at': datetime.utcnow()}
+
+def import_products(lines, fmt):
+    """Insert products from an iterable of text lines in fixed-size batches.
+
+    Only one batch is held in memory at a time, and each batch is committed
+    on its own, so a failure part way through keeps the batches before it.
+    """
+    report = {'inserted': 0, 'failed': 0, 'errors': []}
+    batch = []
+
+    def flush():
+        db.session.execute(Product.__table__.insert(), batch)
+        bump_catalog_version()
+        db.session.commit()
+        report['inserted'] += len(batch)
+        batch.clear()
+
+    try:
+        for number, row, error in parse_import_rows(lines, fmt):
+            if error is None:
+                try:
+                    batch.append(validate_product_row(row))
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                report['failed'] += 1
+                if len(report['errors']) < MAX_IMPORT_ERRORS:
+                    report['errors'].append({'line': number, 'error': error})
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        catalog_cache.invalidate()
+    return report
+
+def export_products(fmt):
+    """Yield the catalog as NDJSON or CSV text, a batch of rows at a time."""
+    rows = read_session.query(
+        Product.id, Product.name, Product.price, Product.image, Product.created_at
+    ).order_by(Product.id).execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(PRODUCT_EXPORT_FIELDS)
+    count = 0
+    for row in rows:
+        created_at = row.created_at.isoformat() if row.created_at else None
+        if writer:
+            writer.writerow((row.id, row.name, row.price, row.image, created_at))
+        else:
+            buffer.write(dumps({
+                'id': row.id,
+                'name': row.name,
+                'price': row.price,
+                'image': row.image,
+                'created_at': created_at
+            }).decode() + '\n')
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def parse_price(value, name):
+    if isinstance(value, bool):
+        raise ValueError('Invalid %s' % name)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid %s' % name)
+    if not math.isfinite(value):
+        raise ValueError('Invalid %s' % name)
+    return value
+
+def bulk_update_filter(spec):
+    """WHERE clauses selecting the products a bulk update's filter names.
+
+    The filter may combine ids, a price range, a name prefix and full-text
+    words (q, as in search); {"all": true} selects the whole catalog.
+    Raises ValueError for anything else.
+    """
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError('A filter is required')
+    unknown = sorted(set(spec) - set(BULK_UPDATE_FILTERS))
+    if unknown:
+        raise ValueError('Unknown filter: %s' % ', '.join(unknown))
+    if 'all' in spec and (spec['all'] is not True or len(spec) > 1):
+        raise ValueError('"all" must be true and the only filter')
+
+    clauses = []
+    if 'ids' in spec:
+        ids = spec['ids']
+        if not isinstance(ids, list) or not ids or len(ids) > MAX_BULK_UPDATE_IDS \
+                or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise ValueError('ids must be a list of up to %d product ids' % MAX_BULK_UPDATE_IDS)
+        # One JSON parameter instead of a bound variable per id.
+        id_list = db.func.json_each(json.dumps(ids)).table_valued('value')
+        clauses.append(Product.id.in_(select(id_list.c.value)))
+    if 'min_price' in spec:
+        clauses.append(Product.price >= parse_price(spec['min_price'], 'min_price'))
+    if 'max_price' in spec:
+        clauses.append(Product.price <= parse_price(spec['max_price'], 'max_price'))
+    if 'prefix' in spec:
+        prefix = spec['prefix']
+        if not isinstance(prefix, str) or not prefix:
+            raise ValueError('Invalid prefix')
+        clauses.extend((Product.name >= prefix, Product.name < name_prefix_upper_bound(prefix)))
+    if 'q' in spec:
+        match = fts_query(spec['q']) if isinstance(spec['q'], str) else ''
+        if not match:
+            raise ValueError('Invalid q')
+        clauses.append(Product.id.in_(
+            text('SELECT rowid FROM product_fts WHERE product_fts MATCH :match')
+            .bindparams(match=match).columns(rowid=db.Integer)
+        ))
+    return clauses
+
+def bulk_update_values(spec):
+    """The SET clause of a bulk update, or raise ValueError.
+
+    Either price (a new price) or price_percent (e.g. -20 for 20% off,
+    rounded to cents), and/or image.
+    """
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError('Nothing to update')
+    unknown = sorted(set(spec) - {'price', 'price_percent', 'image'})
+    if unknown:
+        raise ValueError('Unknown update: %s' % ', '.join(unknown))
+    if 'price' in spec and 'price_percent' in spec:
+        raise ValueError('Give either price or price_percent, not both')
+
+    values = {}
+    if 'price' in spec:
+        price = parse_price(spec['price'], 'price')
+        if price < 0:
+            raise ValueError('Invalid price')
+        values[Product.price] = price
+    if 'price_percent' in spec:
+        percent = parse_price(spec['price_percent'], 'price_percent')
+        if percent <= -100:
+            raise ValueError('price_percent must be above -100')
+        values[Product.price] = db.func.round(Product.price * (1 + percent / 100.0), 2)
+    if 'image' in spec:
+        image = spec['image']
+        if not isinstance(image, str) or len(image) > 500:
+            raise ValueError('Invalid image')
+        values[Product.image] = image
+        # The same image for every row, so its thumbnails are looked up once.
+        values[Product.thumbnails] = thumbnails_for_image(image)
+    return values
+
+def bulk_update_products(filter_spec, update_spec):
+    """Apply one update to every product the filter selects, as a single UPDATE.
+
+    The price facet triggers keep the facets in step; cached product pages
+    are invalidated once. Returns {'updated': rows}.
+    """
+    clauses = bulk_update_filter(filter_spec)
+    values = bulk_update_values(update_spec)
+    try:
+        updated = Product.query.filter(*clauses).update(values, synchronize_session=False)
+        if updated:
+            bump_catalog_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if updated:
+        catalog_cache.invalidate()
+    return {'updated': updated}
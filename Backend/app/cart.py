@@ -0,0 +1,113 @@
+# backend/app/cart.py
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.jsonstream import STREAM_BATCH_SIZE, dumps, iter_json_items, json_stream_response
+from app.metrics import timed
+from app.models import CartItem, Product
+
+def upsert_cart_item(user_id, product_id, quantity, increment=True):
+    """Add to (or, with increment=False, overwrite) a cart line in one statement.
+
+    INSERT ... ON CONFLICT DO UPDATE leaves no window between reading and
+    writing the quantity, so concurrent adds can't lose increments.
+    """
+    stmt = sqlite_insert(CartItem.__table__).values(
+        user_id=user_id,
+        product_id=product_id,
+        quantity=quantity,
+        created_at=datetime.utcnow()
+    )
+    if increment:
+        new_quantity = CartItem.__table__.c.quantity + stmt.excluded.quantity
+    else:
+        new_quantity = stmt.excluded.quantity
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id', 'product_id'],
+        set_={'quantity': new_quantity}
+    ))
+
+def cart_statement(user_id, with_total=True):
+    # One round trip: the outer join keeps items whose product was deleted,
+    # and the window sum puts the cart total on every row. The window has to
+    # see every row before returning the first, so streaming leaves it out
+    # and adds up the total itself.
+    line_total = CartItem.quantity * Product.price
+    columns = [
+        CartItem.id,
+        CartItem.product_id,
+        CartItem.quantity,
+        Product.name,
+        Product.price,
+        Product.image,
+        line_total.label('line_total'),
+    ]
+    if with_total:
+        columns.append(db.func.sum(line_total).over().label('cart_total'))
+    return select(*columns).outerjoin(Product, Product.id == CartItem.product_id).where(
+        CartItem.user_id == user_id
+    ).order_by(CartItem.created_at, CartItem.id)
+
+def cart_line(row):
+    if row.name is None:
+        return {
+            'id': row.id,
+            'product_id': row.product_id,
+            'quantity': row.quantity
+        }
+    return {
+        'id': row.id,
+        'product_id': row.product_id,
+        'quantity': row.quantity,
+        'name': row.name,
+        'price': row.price,
+        'image': row.image,
+        'line_total': row.line_total
+    }
+
+def cart_payload(rows):
+    items, unavailable = [], []
+    for row in rows:
+        (unavailable if row.name is None else items).append(cart_line(row))
+
+    return {
+        'items': items,
+        'unavailable': unavailable,
+        'total': (rows[0].cart_total if rows else None) or 0
+    }
+
+def cart_contents(user_id):
+    with timed('cart_query'):
+        rows = db.session.execute(cart_statement(user_id)).all()
+    return cart_payload(rows)
+
+def iter_cart_json(rows):
+    """Encode the cart_payload() document while the rows are still being read.
+
+    Lines whose product was deleted are rare, so those are held back and
+    written after the items, followed by the total.
+    """
+    unavailable = []
+    total = 0
+
+    def items():
+        nonlocal total
+        for row in rows:
+            if row.name is None:
+                unavailable.append(cart_line(row))
+            else:
+                total += row.line_total
+                yield cart_line(row)
+
+    yield b'{"items":['
+    yield from iter_json_items(items())
+    yield b'],"unavailable":' + dumps(unavailable) + b',"total":' + dumps(total) + b'}'
+
+def cart_response(user_id):
+    with timed('cart_query'):
+        rows = db.session.execute(cart_statement(user_id, with_total=False).execution_options(
+            stream_results=True)).yield_per(STREAM_BATCH_SIZE)
+    return json_stream_response(iter_cart_json(rows))
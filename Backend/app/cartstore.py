@@ -0,0 +1,387 @@
+# backend/app/cartstore.py
+# Where carts live. CART_BACKEND picks one of:
+#
+#   sql     every change is written and committed to cart_item (default)
+#   memory  carts are kept in this process and changes are written to
+#           cart_item in batches, every CART_FLUSH_INTERVAL seconds and
+#           before checkout
+#
+# The memory backend is the system of record for the carts it holds, so a
+# user's requests must all reach the same process: run a single worker
+# (WEB_CONCURRENCY=1 with threads; gunicorn.conf.py refuses more) or route
+# users to single-worker servers. Changes acknowledged
+# less than CART_FLUSH_INTERVAL seconds before a crash are lost; a clean
+# shutdown flushes them. bench/cart_crash_recovery.py measures the window.
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+import atexit
+import itertools
+import logging
+import threading
+
+from flask import current_app
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.cart import cart_response, iter_cart_json, upsert_cart_item
+from app.jsonstream import STREAM_BATCH_SIZE, json_stream_response
+from app.metrics import metrics, timed
+from app.models import CartItem, Product
+
+logger = logging.getLogger(__name__)
+
+CART_BACKENDS = ('sql', 'memory')
+
+def init_cart_store(app):
+    backend = app.config['CART_BACKEND']
+    if backend == 'sql':
+        store = SqlCartStore()
+    elif backend == 'memory':
+        store = MemoryCartStore(db.get_engine(app), app.config['CART_FLUSH_INTERVAL'],
+                                app.config['CART_STORE_SIZE'])
+        atexit.register(store.close)
+    else:
+        raise ValueError('CART_BACKEND must be one of %s, not %r' % (', '.join(CART_BACKENDS), backend))
+    app.extensions['cart_store'] = store
+    return store
+
+def get_cart_store():
+    return current_app.extensions['cart_store']
+
+def line_payload(line_id, product_id, quantity):
+    return {
+        'id': line_id,
+        'product_id': product_id,
+        'quantity': quantity
+    }
+
+class SqlCartStore:
+    """Carts as cart_item rows, each change committed before it is acknowledged."""
+
+    def add(self, user_id, product_id, quantity):
+        try:
+            upsert_cart_item(user_id, product_id, quantity)
+            # Still inside the write transaction, so this sees our own upsert.
+            line = db.session.query(CartItem.id, CartItem.product_id, CartItem.quantity).filter_by(
+                user_id=user_id,
+                product_id=product_id
+            ).one()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return line_payload(line.id, line.product_id, line.quantity)
+
+    def update(self, user_id, product_id, quantity):
+        """Set an existing line's quantity; return None if there is no such line."""
+        cart_item = CartItem.query.filter_by(user_id=user_id, product_id=product_id).first()
+        if cart_item is None:
+            return None
+        try:
+            cart_item.quantity = quantity
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return line_payload(cart_item.id, cart_item.product_id, cart_item.quantity)
+
+    def remove(self, user_id, product_id):
+        try:
+            removed = CartItem.query.filter_by(
+                user_id=user_id,
+                product_id=product_id
+            ).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return removed > 0
+
+    def apply(self, user_id, operations):
+        """Apply validated (op, product_id, quantity) tuples in one transaction."""
+        try:
+            for op, product_id, quantity in operations:
+                if op == 'remove' or (op == 'set' and quantity <= 0):
+                    CartItem.query.filter_by(
+                        user_id=user_id,
+                        product_id=product_id
+                    ).delete(synchronize_session=False)
+                else:
+                    upsert_cart_item(user_id, product_id, quantity, increment=(op == 'add'))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def response(self, user_id):
+        return cart_response(user_id)
+
+    def flush(self, user_id=None):
+        pass
+
+    def checked_out(self, user_id, lines):
+        pass
+
+    def expire(self, user_ids):
+        pass
+
+    def reset(self):
+        pass
+
+# Shaped like a cart_statement() row, for iter_cart_json().
+CartRow = namedtuple('CartRow', ['id', 'product_id', 'quantity', 'name', 'price', 'image', 'line_total'])
+
+class CartLine:
+    __slots__ = ('id', 'quantity', 'created_at')
+
+    def __init__(self, line_id, quantity, created_at):
+        self.id = line_id
+        self.quantity = quantity
+        self.created_at = created_at
+
+class MemoryCartStore:
+    """Carts held in process memory and written behind to cart_item.
+
+    Each cart is loaded from cart_item on first use and then changed only
+    here. Changed lines are remembered per user and written in one
+    transaction by a background thread every ``flush_interval`` seconds.
+    Up to ``maxsize`` carts are kept; the least recently used ones are
+    dropped once written.
+
+    New lines get their cart_item id here, when they are added, so the
+    response carries it as the SQL backend's does. This process is the only
+    one writing cart_item rows, so ids past the largest one are free.
+    """
+
+    def __init__(self, engine, flush_interval=1.0, maxsize=10000):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one writer, so a stale batch never lands last
+        self.reset()
+
+    def reset(self):
+        """Forget everything; a forked child starts empty and without a flusher."""
+        self._carts = OrderedDict()  # user_id -> OrderedDict(product_id -> CartLine)
+        self._dirty = {}  # user_id -> product ids changed since the last flush
+        self._flusher = None
+        self._stopped = threading.Event()
+        self._next_ids = None  # counter for new line ids, started on first use
+
+    # Cart operations
+
+    def add(self, user_id, product_id, quantity):
+        cart = self._load(user_id)
+        ids = self._line_ids()
+        with self._lock:
+            cart = self._carts.setdefault(user_id, cart)
+            line = cart.get(product_id)
+            if line is None:
+                line = cart[product_id] = CartLine(next(ids), 0, datetime.utcnow())
+            line.quantity += quantity
+            self._mark(user_id, product_id)
+            return line_payload(line.id, product_id, line.quantity)
+
+    def update(self, user_id, product_id, quantity):
+        cart = self._load(user_id)
+        with self._lock:
+            cart = self._carts.setdefault(user_id, cart)
+            line = cart.get(product_id)
+            if line is None:
+                return None
+            line.quantity = quantity
+            self._mark(user_id, product_id)
+            return line_payload(line.id, product_id, line.quantity)
+
+    def remove(self, user_id, product_id):
+        cart = self._load(user_id)
+        with self._lock:
+            cart = self._carts.setdefault(user_id, cart)
+            if cart.pop(product_id, None) is None:
+                return False
+            self._mark(user_id, product_id)
+            return True
+
+    def apply(self, user_id, operations):
+        cart = self._load(user_id)
+        ids = self._line_ids()
+        now = datetime.utcnow()
+        with self._lock:
+            cart = self._carts.setdefault(user_id, cart)
+            for op, product_id, quantity in operations:
+                if op == 'remove' or (op == 'set' and quantity <= 0):
+                    cart.pop(product_id, None)
+                else:
+                    line = cart.get(product_id)
+                    if line is None:
+                        line = cart[product_id] = CartLine(next(ids), 0, now)
+                    line.quantity = line.quantity + quantity if op == 'add' else quantity
+                self._mark(user_id, product_id)
+
+    def response(self, user_id):
+        cart = self._load(user_id)
+        with self._lock:
+            cart = self._carts.setdefault(user_id, cart)
+            lines = [(line.id, product_id, line.quantity) for product_id, line in cart.items()]
+        return json_stream_response(iter_cart_json(self._rows(lines)))
+
+    def _rows(self, lines):
+        # Product details are looked up a batch of lines at a time, so a
+        # large cart streams like the SQL backend's does.
+        for start in range(0, len(lines), STREAM_BATCH_SIZE):
+            batch = lines[start:start + STREAM_BATCH_SIZE]
+            with timed('cart_query'):
+                products = {row.id: row for row in db.session.query(
+                    Product.id, Product.name, Product.price, Product.image
+                ).filter(Product.id.in_({product_id for _, product_id, _ in batch}))}
+            for line_id, product_id, quantity in batch:
+                product = products.get(product_id)
+                if product is None:
+                    yield CartRow(line_id, product_id, quantity, None, None, None, None)
+                else:
+                    yield CartRow(line_id, product_id, quantity, product.name, product.price,
+                                  product.image, quantity * product.price)
+
+    # Checkout
+
+    def checked_out(self, user_id, lines):
+        """Take an order's lines out of the cart, as place_order() did in cart_item.
+
+        Anything added while the order was being placed stays, and is
+        written by the next flush.
+        """
+        with self._lock:
+            cart = self._carts.get(user_id)
+            if cart is None:
+                return
+            for ordered in lines:
+                line = cart.get(ordered.product_id)
+                if line is None:
+                    continue
+                line.quantity -= ordered.quantity
+                if line.quantity <= 0:
+                    del cart[ordered.product_id]
+                self._mark(user_id, ordered.product_id)
+
+    def expire(self, user_ids):
+        """Forget carts the expiry job deleted from cart_item, unless they changed since."""
+        with self._lock:
+            for user_id in user_ids:
+                if user_id not in self._dirty:
+                    self._carts.pop(user_id, None)
+
+    # Loading and flushing
+
+    def _load(self, user_id):
+        with self._lock:
+            cart = self._carts.get(user_id)
+            if cart is not None:
+                self._carts.move_to_end(user_id)
+                return cart
+        # A cart that isn't held here has nothing waiting to be written,
+        # so cart_item is up to date.
+        with timed('cart_query'):
+            rows = db.session.query(
+                CartItem.id, CartItem.product_id, CartItem.quantity, CartItem.created_at
+            ).filter(CartItem.user_id == user_id).order_by(CartItem.created_at, CartItem.id).all()
+        return OrderedDict((row.product_id, CartLine(row.id, row.quantity, row.created_at))
+                           for row in rows)
+
+    def _line_ids(self):
+        if self._next_ids is None:
+            with self.engine.connect() as connection:
+                largest = connection.execute(select(func.max(CartItem.id))).scalar() or 0
+            with self._lock:
+                if self._next_ids is None:
+                    self._next_ids = itertools.count(largest + 1)
+        return self._next_ids
+
+    def _mark(self, user_id, product_id):
+        # Called with self._lock held.
+        self._dirty.setdefault(user_id, set()).add(product_id)
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._run_flusher, args=(self._stopped,),
+                                             name='cart-flush', daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self, stopped):
+        while not stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Cart flush failed; retrying in %.1fs', self.flush_interval)
+
+    def flush(self, user_id=None):
+        """Write changed lines to cart_item: one user's, or everyone's."""
+        with self._flush_lock:
+            with self._lock:
+                if user_id is None:
+                    dirty, self._dirty = self._dirty, {}
+                elif user_id in self._dirty:
+                    dirty = {user_id: self._dirty.pop(user_id)}
+                else:
+                    return 0
+                upserts, deletes = [], []
+                for dirty_user, product_ids in dirty.items():
+                    cart = self._carts.get(dirty_user, {})
+                    for product_id in product_ids:
+                        line = cart.get(product_id)
+                        if line is None:
+                            deletes.append({'cart_user_id': dirty_user, 'cart_product_id': product_id})
+                        else:
+                            upserts.append({'id': line.id, 'user_id': dirty_user, 'product_id': product_id,
+                                            'quantity': line.quantity, 'created_at': line.created_at})
+            if not dirty:
+                return 0
+            try:
+                self._write(upserts, deletes)
+            except Exception:
+                # Put the lines back; whatever they hold by the next flush is written then.
+                with self._lock:
+                    for dirty_user, product_ids in dirty.items():
+                        self._dirty.setdefault(dirty_user, set()).update(product_ids)
+                metrics.inc('cart_store_flush_errors_total')
+                raise
+            metrics.inc('cart_store_flushes_total')
+            metrics.inc('cart_store_flushed_lines_total', value=len(upserts) + len(deletes))
+            if user_id is None:
+                self._evict()
+            return len(upserts) + len(deletes)
+
+    def _write(self, upserts, deletes):
+        table = CartItem.__table__
+        with self.engine.begin() as connection:
+            if upserts:
+                stmt = sqlite_insert(table)
+                connection.execute(stmt.on_conflict_do_update(
+                    index_elements=['user_id', 'product_id'],
+                    set_={'quantity': stmt.excluded.quantity}
+                ), upserts)
+            if deletes:
+                connection.execute(table.delete().where(
+                    table.c.user_id == bindparam('cart_user_id'),
+                    table.c.product_id == bindparam('cart_product_id')
+                ), deletes)
+
+    def _evict(self):
+        with self._lock:
+            excess = len(self._carts) - self.maxsize
+            if excess <= 0:
+                return
+            clean = [user_id for user_id in self._carts if user_id not in self._dirty][:excess]
+            for user_id in clean:
+                del self._carts[user_id]
+
+    def close(self):
+        """Stop the flusher and write what is left (at interpreter exit)."""
+        self._stopped.set()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Final cart flush failed; recent cart changes are lost')
+
+metrics.describe('cart_store_flushes_total', 'counter', 'Write-behind cart flushes.')
+metrics.describe('cart_store_flushed_lines_total', 'counter', 'Cart lines written by flushes.')
+metrics.describe('cart_store_flush_errors_total', 'counter', 'Cart flushes that failed and were retried.')
@@ -0,0 +1,271 @@
+# backend/app/catalog.py
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+from flask import Response, request
+from sqlalchemy import select
+from werkzeug.http import parse_accept_header
+
+from app import db, read_session
+from app.jsonstream import dumps
+from app.models import CatalogMeta, Product
+
+try:
+    import brotli
+except ImportError:  # optional; without it only gzip variants are built
+    brotli = None
+
+CATALOG_VERSION_QUERY = select(CatalogMeta.version).where(CatalogMeta.id == 1)
+
+# Catalog snapshots
+# A serialized response body plus its precompressed variants.
+Snapshot = namedtuple('Snapshot', ['etag', 'identity', 'gzip', 'br'])
+
+class CatalogCache:
+    """Pre-serialized product pages for the current catalog version.
+
+    The version lives in the catalog_meta row. It is re-read at most once
+    every ``version_ttl`` seconds, or right away after a local write, and a
+    new version drops every page built for the old one.
+    """
+
+    def __init__(self, maxsize=256, version_ttl=1.0):
+        self.maxsize = maxsize
+        self.version_ttl = version_ttl
+        self._version = None
+        self._checked_at = 0.0
+        self._pages = OrderedDict()  # query key -> Snapshot
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.maxsize = app.config['CATALOG_CACHE_SIZE']
+        self.version_ttl = app.config['CATALOG_VERSION_TTL']
+
+    def current_version(self):
+        if self.version_is_stale():
+            self.set_version(read_session.execute(CATALOG_VERSION_QUERY).scalar())
+        return self.version
+
+    @property
+    def version(self):
+        return self._version
+
+    def version_is_stale(self):
+        return self._version is None or time.monotonic() - self._checked_at >= self.version_ttl
+
+    def set_version(self, version):
+        """Record the version just read from catalog_meta."""
+        with self._lock:
+            if version != self._version:
+                self._pages.clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Force the next read to pick up the version from the database."""
+        with self._lock:
+            self._version = None
+
+    def get(self, version, key):
+        with self._lock:
+            if version != self._version:
+                return None
+            snapshot = self._pages.get(key)
+            if snapshot is not None:
+                self._pages.move_to_end(key)
+            return snapshot
+
+    def put(self, version, key, payload):
+        body = dumps(payload)
+        snapshot = Snapshot(
+            etag=hashlib.sha1(body).hexdigest(),
+            identity=body,
+            gzip=gzip.compress(body, compresslevel=6),
+            br=brotli.compress(body) if brotli is not None else None,
+        )
+        with self._lock:
+            if version == self._version:
+                self._pages[key] = snapshot
+                while len(self._pages) > self.maxsize:
+                    self._pages.popitem(last=False)
+        return snapshot
+
+catalog_cache = CatalogCache()
+
+def bump_catalog_version():
+    """Mark cached product pages stale; call before committing a product write.
+
+    Returns the new version, which the write's commit publishes.
+    """
+    db.session.query(CatalogMeta).filter_by(id=1).update(
+        {CatalogMeta.version: CatalogMeta.version + 1}, synchronize_session=False)
+    return db.session.query(CatalogMeta.version).filter_by(id=1).scalar()
+
+def negotiate_snapshot(snapshot, if_none_match, accept_encoding):
+    """Pick the representation to send; return (status, body, headers)."""
+    # The ETag names the JSON document; compressed variants get a suffix so
+    # each representation still has a distinct strong validator.
+    etags = [tag.strip() for tag in (if_none_match or '').split(',')]
+    # Parsed as request.accept_encodings would be (the asyncio server has
+    # only the header), so q-values count and q=0 refuses an encoding. Ties
+    # go to the smaller body; if everything is refused, send it uncompressed.
+    offered = ['br', 'gzip', 'identity'] if snapshot.br is not None else ['gzip', 'identity']
+    chosen = parse_accept_header(accept_encoding or '').best_match(offered, default='identity')
+    if chosen == 'br':
+        body, encoding, etag = snapshot.br, 'br', snapshot.etag + '-br'
+    elif chosen == 'gzip':
+        body, encoding, etag = snapshot.gzip, 'gzip', snapshot.etag + '-gz'
+    else:
+        body, encoding, etag = snapshot.identity, None, snapshot.etag
+
+    headers = {
+        'ETag': '"%s"' % etag,
+        'Vary': 'Accept-Encoding, Authorization',
+        'Cache-Control': 'private, no-cache',
+    }
+    if '"%s"' % etag in etags or '*' in etags:
+        return 304, b'', headers
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return 200, body, headers
+
+def snapshot_response(snapshot):
+    status, body, headers = negotiate_snapshot(
+        snapshot, request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding'))
+    if status == 304:
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype='application/json', headers=headers)
+
+# Product listing: sort name -> (key column, descending)
+PRODUCT_SORTS = {
+    'newest': ('created_at', True),
+    'oldest': ('created_at', False),
+    'price_asc': ('price', False),
+    'price_desc': ('price', True),
+    'name_asc': ('name', False),
+    'name_desc': ('name', True),
+}
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(sort, product):
+    key = getattr(product, PRODUCT_SORTS[sort][0])
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    payload = json.dumps({'s': sort, 'k': key, 'id': product.id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort):
+    """Return the (key, id) position stored in a cursor, or raise ValueError."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key, last_id = payload['k'], int(payload['id'])
+    except (ValueError, TypeError, KeyError):
+        raise ValueError('Invalid cursor')
+    if payload.get('s') != sort:
+        raise ValueError('Cursor does not match sort order')
+    column = PRODUCT_SORTS[sort][0]
+    # The key is client input too: a tampered one is a bad request.
+    try:
+        if column == 'created_at':
+            key = datetime.fromisoformat(key)
+        elif column == 'name':
+            if not isinstance(key, str):
+                raise TypeError(key)
+        else:
+            key = float(key)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    return key, last_id
+
+def name_prefix_upper_bound(prefix):
+    # Smallest string greater than every string starting with prefix, so the
+    # prefix filter becomes an index range scan instead of a LIKE.
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def fts_query(terms, prefix_last=False):
+    """Turn free text into an FTS5 query matching every word.
+
+    Each word is quoted so user input can never be parsed as FTS5 syntax.
+    """
+    words = ['"%s"' % word.replace('"', '""') for word in terms.split()]
+    if prefix_last and words:
+        words[-1] += '*'
+    return ' '.join(words)
+
+def _parse(args, name, convert, default=None):
+    # Like werkzeug's args.get(type=...): a malformed value counts as absent.
+    try:
+        return convert(args[name])
+    except (KeyError, TypeError, ValueError):
+        return default
+
+def product_list_params(args):
+    """Read the product list query string; raise ValueError for a bad sort."""
+    sort = args.get('sort', 'newest')
+    if sort not in PRODUCT_SORTS:
+        raise ValueError('Invalid sort option')
+    limit = max(1, min(_parse(args, 'limit', int, DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    return {
+        'sort': sort,
+        'limit': limit,
+        'min_price': _parse(args, 'min_price', float),
+        'max_price': _parse(args, 'max_price', float),
+        'prefix': args.get('prefix', ''),
+        'cursor': args.get('cursor'),
+    }
+
+def product_page_statement(sort, limit, min_price=None, max_price=None, prefix='', cursor=None):
+    """SELECT for one page of the product list, or raise ValueError for a bad cursor.
+
+    Shared by the Flask view and the asyncio read server, so both page the
+    catalog the same way. One extra row is fetched to learn whether another
+    page exists.
+    """
+    column_name, descending = PRODUCT_SORTS[sort]
+    column = getattr(Product, column_name)
+    # Only the columns a page shows (and created_at for its cursor); no ORM
+    # objects are built.
+    statement = select(Product.id, Product.name, Product.price, Product.image,
+                       Product.thumbnails, Product.created_at)
+
+    if min_price is not None:
+        statement = statement.where(Product.price >= min_price)
+    if max_price is not None:
+        statement = statement.where(Product.price <= max_price)
+    if prefix:
+        statement = statement.where(Product.name >= prefix,
+                                    Product.name < name_prefix_upper_bound(prefix))
+
+    if cursor:
+        key, last_id = decode_cursor(cursor, sort)
+        position = db.tuple_(column, Product.id)
+        statement = statement.where(position < (key, last_id) if descending
+                                    else position > (key, last_id))
+
+    if descending:
+        statement = statement.order_by(column.desc(), Product.id.desc())
+    else:
+        statement = statement.order_by(column.asc(), Product.id.asc())
+    return statement.limit(limit + 1)
+
+def product_page_payload(products, sort, limit):
+    has_more = len(products) > limit
+    products = products[:limit]
+    return {
+        'products': [{
+            'id': product.id,
+            'name': product.name,
+            'price': product.price,
+            'image': product.image,
+            'thumbnails': product.thumbnails
+        } for product in products],
+        'next_cursor': encode_cursor(sort, products[-1]) if has_more else None
+    }
@@ -0,0 +1,129 @@
+# backend/app/commands.py
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app import db
+from app.bulk import export_products, import_products
+from app.facets import rebuild_facets
+from app.maintenance import JOBS, run_due_jobs
+from app.productindex import ProductIndex, check_product_index
+from app.related import rebuild_related
+from app.schema import init_db
+from app.uploads import hash_legacy_uploads
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create or upgrade the database schema."""
+    init_db()
+    click.echo('Database is up to date')
+
+@click.command('rebuild-facets')
+@with_appcontext
+def rebuild_facets_command():
+    """Recount the price facets from the product table."""
+    rebuild_facets(current_app.config['PRICE_FACET_BOUNDS'])
+    click.echo('Price facets rebuilt')
+
+@click.command('rebuild-related')
+@with_appcontext
+def rebuild_related_command():
+    """Recount the frequently-bought-together pairs from the cart table."""
+    pairs = rebuild_related()
+    click.echo('Related products rebuilt: %d pairs' % pairs)
+
+@click.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']),
+              help='Input format; guessed from the file extension if omitted.')
+@with_appcontext
+def import_products_command(path, fmt):
+    """Bulk-load products from an NDJSON or CSV file."""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    with open(path, newline='', encoding='utf-8') as f:
+        report = import_products(f, fmt)
+    click.echo('Inserted %d products, %d rows failed' % (report['inserted'], report['failed']))
+    for error in report['errors']:
+        click.echo('  line %d: %s' % (error['line'], error['error']), err=True)
+
+@click.command('export-products')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']),
+              help='Output format; guessed from the file extension if omitted.')
+@with_appcontext
+def export_products_command(path, fmt):
+    """Write the whole catalog to an NDJSON or CSV file."""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for chunk in export_products(fmt):
+            f.write(chunk)
+
+@click.command('hash-uploads')
+@with_appcontext
+def hash_uploads_command():
+    """Move uploads that predate content-hashed names onto hashed URLs."""
+    renamed = hash_legacy_uploads()
+    for old, new in renamed.items():
+        click.echo('%s -> %s' % (old, new))
+    click.echo('%d uploads moved to content-hashed names' % len(renamed))
+
+@click.command('maintenance')
+@click.argument('jobs', nargs=-1, type=click.Choice(sorted(JOBS)))
+@click.option('--force', is_flag=True, help='Run the jobs even if they are not due.')
+@click.option('--loop', is_flag=True, help='Keep checking for due jobs (run as a sidecar).')
+@with_appcontext
+def maintenance_command(jobs, force, loop):
+    """Run the maintenance jobs that are due (or the ones named)."""
+    names = set(jobs) or None
+    while True:
+        for result in run_due_jobs(names, force):
+            click.echo('%-18s %8d rows %8.3fs  longest write %6.1f ms  %s' % (
+                result['job'], result['rows'], result['seconds'], result['longest_write'] * 1000,
+                'failed: %s' % result['error'] if result['error'] else 'ok'))
+        if not loop:
+            break
+        time.sleep(current_app.config['MAINTENANCE_TICK'])
+
+@click.command('vacuum')
+@with_appcontext
+def vacuum_command():
+    """Rebuild the database file in incremental auto-vacuum mode.
+
+    Holds the write lock until it finishes; run it while the app is down.
+    """
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        connection.exec_driver_sql('VACUUM')
+    click.echo('Database vacuumed; free pages are now returned by the incremental_vacuum job')
+
+@click.command('product-index')
+@with_appcontext
+def product_index_command():
+    """Load the in-memory product index, report its size and check it against the table."""
+    index = ProductIndex()
+    index.load(current_app._get_current_object())
+    status = index.status()
+    if status['last_load']['error']:
+        raise click.ClickException('Loading failed: %s' % status['last_load']['error'])
+    memory = status['memory']
+    click.echo('%d products at catalog version %s loaded in %.2fs' % (
+        status['products'], status['version'], status['last_load']['seconds']))
+    click.echo('%d bytes, %s per product' % (memory['bytes'], memory['bytes_per_product']))
+    for column, size in memory['columns'].items():
+        click.echo('  %-12s %12d bytes' % (column, size))
+    report = check_product_index(index)
+    if not report['ok']:
+        raise click.ClickException('Index differs from the table: %d products (e.g. missing %s, '
+                                   'extra %s, mismatched %s), sort orders %s' % (
+                                       report['differences'], report['missing'], report['extra'],
+                                       report['mismatched'], 'ok' if report['orders_ok'] else 'broken'))
+    click.echo('Index matches the product table')
+
+def register_commands(app):
+    for command in (init_db_command, rebuild_facets_command, rebuild_related_command,
+                    import_products_command, export_products_command, hash_uploads_command,
+                    maintenance_command, vacuum_command, product_index_command):
+        app.cli.add_command(command)
@@ -1,6 +1,115 @@
 import os
 
+from sqlalchemy.pool import QueuePool
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-please-change'
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///ecommerce.db'
+    SQLALCHEMY_DATABASE_URI = (os.environ.get('DATABASE_URL')
+                               or 'sqlite:///' + os.path.join(BASE_DIR, 'ecommerce.db'))
+    # Read-only endpoints use their own engine; point this at a replica to
+    # move catalog reads off the primary. Defaults to the primary database.
+    READ_DATABASE_URL = os.environ.get('READ_DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        # Flask-SQLAlchemy would otherwise pick NullPool for SQLite files and
+        # open a new connection (re-running the pragmas) on every checkout.
+        'poolclass': QueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': 10,
+        # Pooled SQLite connections are handed to whichever thread asks next.
+        'connect_args': {'check_same_thread': False},
+    }
+    # Applied to every new SQLite connection. WAL lets readers run alongside
+    # the writer; synchronous=NORMAL is durable across crashes in WAL mode.
+    # auto_vacuum only takes effect on a new database, or after `flask vacuum`.
+    SQLITE_PRAGMAS = {
+        'auto_vacuum': 'INCREMENTAL',
+        'journal_mode': 'WAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'synchronous': 'NORMAL',
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'temp_store': 'MEMORY',
+    }
+
+    CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:5173').split(',')
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(BASE_DIR, 'uploads')
+
+    AUTH_CACHE_SIZE = 10000  # verified tokens kept in memory
+    AUTH_CACHE_TTL = 300  # seconds; never longer than the token's exp
+    # Seconds before re-reading the auth_meta version: the longest a demotion
+    # or deletion made by another worker (or in bulk SQL) can go unnoticed.
+    AUTH_VERSION_TTL = 1.0
+    CATALOG_CACHE_SIZE = 256  # product pages kept per catalog version
+    CATALOG_VERSION_TTL = 1.0  # seconds before re-reading the version row
+    # Answer product list pages from an in-memory copy of the catalog
+    # (app/productindex.py); costs each worker a few hundred bytes per product.
+    PRODUCT_INDEX_ENABLED = os.environ.get('PRODUCT_INDEX_ENABLED', '0') != '0'
+    UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 2 * 1024 ** 3))  # bytes, for chunked uploads
+    MEDIA_MAX_AGE = 300  # seconds browsers keep uploads whose name isn't their content hash
+    # Let the front-end server send /uploads files: '', 'x-sendfile' (Apache,
+    # lighttpd) or 'x-accel-redirect' (nginx, with an internal location at
+    # MEDIA_ACCEL_LOCATION aliased to UPLOAD_FOLDER).
+    MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '')
+    MEDIA_ACCEL_LOCATION = os.environ.get('MEDIA_ACCEL_LOCATION', '/_uploads/')
+    THUMBNAIL_WIDTHS = (160, 320, 640)  # WebP derivatives made per upload
+    IMAGE_WORKERS = 2  # processes generating derivatives
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:260000'  # stored hashes are upgraded on login
+    HASH_WORKERS = 2  # threads hashing passwords
+    HASH_QUEUE_LIMIT = 16  # hashes allowed to wait for a thread before we shed load
+    HASH_TIMEOUT = 10  # seconds a request waits for its hash
+
+    # Upper bounds of the price facet buckets; `flask init-db` re-buckets
+    # the catalog after a change.
+    PRICE_FACET_BOUNDS = (10, 25, 50, 100, 250, 500, 1000)
+
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))  # statements logged to app.sql.slow
+    # Fraction of responses that get a Server-Timing breakdown header.
+    REQUEST_BREAKDOWN_SAMPLE_RATE = float(os.environ.get('REQUEST_BREAKDOWN_SAMPLE_RATE', 0))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # bearer token required by /metrics, if set
+
+    # Requests per second and burst size per client, by request class:
+    # signed-in users are counted by user id, everyone else (and every
+    # /api/auth request) by address.
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+    RATE_LIMITS = {
+        'read': (50, 100),
+        'write': (10, 20),
+        'auth': (1, 5),
+    }
+    RATE_LIMIT_MAX_CLIENTS = 100000  # buckets kept per class
+    # Beyond these the process answers 503: requests being handled at once,
+    # and the moving average of write statement time (SQLite lock waits).
+    MAX_IN_FLIGHT_REQUESTS = int(os.environ.get('MAX_IN_FLIGHT_REQUESTS', 64))
+    SHED_WRITE_LATENCY_MS = float(os.environ.get('SHED_WRITE_LATENCY_MS', 500))
+    # Proxies in front of the app whose X-Forwarded-For is trusted for the client address.
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+
+    # 'sql' commits every cart change; 'memory' keeps carts in the process and
+    # writes them behind in batches (single worker only; see app/cartstore.py).
+    CART_BACKEND = os.environ.get('CART_BACKEND', 'sql')
+    CART_FLUSH_INTERVAL = float(os.environ.get('CART_FLUSH_INTERVAL', 1.0))  # seconds of changes a crash can lose
+    CART_STORE_SIZE = 10000  # carts kept in memory by the memory backend
+
+    # Background upkeep (app/maintenance.py): seconds between runs of each job.
+    MAINTENANCE_ENABLED = os.environ.get('MAINTENANCE_ENABLED', '1') != '0'
+    MAINTENANCE_JOBS = {
+        'expire_carts': 3600,
+        'expire_uploads': 3600,
+        'checkpoint': 300,
+        'incremental_vacuum': 3600,
+        'analyze': 24 * 3600,
+    }
+    MAINTENANCE_TICK = 60  # seconds between each worker's checks for due jobs
+    # Jobs write in short transactions, pausing in between so requests get
+    # the write lock, and leave what's left after the budget for next time.
+    MAINTENANCE_WRITE_TARGET_MS = 10  # batches grow or shrink to hold the write lock about this long
+    MAINTENANCE_BATCH_SIZE = 1000  # most rows per batch
+    MAINTENANCE_BATCH_PAUSE = 0.05  # seconds
+    MAINTENANCE_JOB_BUDGET = 60  # seconds
+    VACUUM_PAGES = 256  # pages freed per incremental vacuum step
+    ANALYZE_LIMIT = 1000  # rows ANALYZE samples per index
+    CART_EXPIRY_DAYS = int(os.environ.get('CART_EXPIRY_DAYS', 30))  # since the newest line was added
+    UPLOAD_SESSION_TTL = 24 * 3600  # seconds an unfinished chunked upload may sit idle
@@ -0,0 +1,58 @@
+# backend/app/database.py
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+def install_sqlite_pragmas(engine, pragmas, read_only=False):
+    """Run the configured PRAGMAs on each new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+        if read_only:
+            cursor.execute('PRAGMA query_only = ON')
+        cursor.close()
+
+def init_read_session(session, db, app):
+    """Bind the read-only scoped session to its own engine and pool.
+
+    Uses READ_DATABASE_URL when set, otherwise the primary database, so
+    catalog reads never wait for a pool slot held by a write.
+    """
+    url = app.config.get('READ_DATABASE_URL') or app.config['SQLALCHEMY_DATABASE_URI']
+    sa_url, options = db.apply_driver_hacks(
+        app, make_url(url), dict(app.config['SQLALCHEMY_ENGINE_OPTIONS']))
+    engine = create_engine(sa_url, **options)
+    install_sqlite_pragmas(engine, app.config['SQLITE_PRAGMAS'], read_only=True)
+
+    app.extensions['read_engine'] = engine
+    session.configure(bind=engine)
+    app.teardown_appcontext(lambda exception: session.remove())
+
+def run_in_forked_child(*callbacks):
+    """Call each callback in a child process right after fork().
+
+    Windows has no fork() (nor os.register_at_fork); there every process
+    builds its own app, so there is nothing to reset.
+    """
+    if not hasattr(os, 'register_at_fork'):
+        return
+    for callback in callbacks:
+        os.register_at_fork(after_in_child=callback)
+
+def dispose_engines_after_fork(db, app):
+    """Drop inherited pooled connections in forked workers.
+
+    A connection opened before fork() must not be used by both processes;
+    after this each worker opens its own on first use.
+    """
+    def dispose():
+        db.get_engine(app).dispose()
+        app.extensions['read_engine'].dispose()
+
+    run_in_forked_child(dispose)
@@ -0,0 +1,103 @@
+# backend/app/facets.py
+# Price facets for the product grid: a count per price bucket plus the total
+# and min/max price. Triggers on product keep the numbers current on every
+# write path (views, bulk import, checkout, raw SQL), so reading them costs
+# one row per bucket instead of a GROUP BY over the catalog.
+from sqlalchemy import text
+
+from app import db
+from app.models import CatalogStats, PriceBucket, Product
+
+# Bucket condition shared by the triggers; :price is new.price or old.price.
+_IN_BUCKET = '(lower IS NULL OR {price} >= lower) AND (upper IS NULL OR {price} < upper)'
+
+# After a delete or a price change the removed price may have been the min
+# or max; only then is it looked up again, which the price index answers
+# with a single seek.
+PRICE_FACET_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS product_facets_ai AFTER INSERT ON product BEGIN
+        UPDATE price_bucket SET count = count + 1 WHERE %(new)s;
+        UPDATE catalog_stats SET
+            product_count = product_count + 1,
+            min_price = CASE WHEN min_price IS NULL OR new.price < min_price
+                             THEN new.price ELSE min_price END,
+            max_price = CASE WHEN max_price IS NULL OR new.price > max_price
+                             THEN new.price ELSE max_price END
+        WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_facets_ad AFTER DELETE ON product BEGIN
+        UPDATE price_bucket SET count = count - 1 WHERE %(old)s;
+        UPDATE catalog_stats SET
+            product_count = product_count - 1,
+            min_price = CASE WHEN old.price <= min_price
+                             THEN (SELECT MIN(price) FROM product) ELSE min_price END,
+            max_price = CASE WHEN old.price >= max_price
+                             THEN (SELECT MAX(price) FROM product) ELSE max_price END
+        WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_facets_au AFTER UPDATE OF price ON product
+    WHEN old.price IS NOT new.price BEGIN
+        UPDATE price_bucket SET count = count - 1 WHERE %(old)s;
+        UPDATE price_bucket SET count = count + 1 WHERE %(new)s;
+        UPDATE catalog_stats SET
+            min_price = CASE WHEN new.price < min_price THEN new.price
+                             WHEN old.price <= min_price THEN (SELECT MIN(price) FROM product)
+                             ELSE min_price END,
+            max_price = CASE WHEN new.price > max_price THEN new.price
+                             WHEN old.price >= max_price THEN (SELECT MAX(price) FROM product)
+                             ELSE max_price END
+        WHERE id = 1;
+    END""",
+)
+
+def create_facet_triggers():
+    conditions = {'new': _IN_BUCKET.format(price='new.price'),
+                  'old': _IN_BUCKET.format(price='old.price')}
+    for statement in PRICE_FACET_TRIGGERS:
+        db.session.execute(text(statement % conditions))
+    db.session.commit()
+
+def bucket_ranges(bounds):
+    """[(lower, upper), ...] covering every price, split at the given bounds."""
+    edges = [None] + sorted(bounds) + [None]
+    return list(zip(edges[:-1], edges[1:]))
+
+def facets_match(bounds):
+    stored = [(bucket.lower, bucket.upper)
+              for bucket in PriceBucket.query.order_by(PriceBucket.id)]
+    return stored == bucket_ranges(bounds)
+
+def rebuild_facets(bounds):
+    """Recount every bucket and the stats row from product; repairs any drift.
+
+    Runs in one transaction, so the triggers and readers never see a
+    half-built table.
+    """
+    PriceBucket.query.delete()
+    for position, (lower, upper) in enumerate(bucket_ranges(bounds)):
+        # Each count is a range scan of the price index.
+        query = db.session.query(db.func.count(Product.id))
+        if lower is not None:
+            query = query.filter(Product.price >= lower)
+        if upper is not None:
+            query = query.filter(Product.price < upper)
+        db.session.add(PriceBucket(id=position, lower=lower, upper=upper, count=query.scalar()))
+
+    count, min_price, max_price = db.session.query(
+        db.func.count(Product.id), db.func.min(Product.price), db.func.max(Product.price)).one()
+    stats = CatalogStats.query.get(1) or CatalogStats(id=1)
+    stats.product_count, stats.min_price, stats.max_price = count, min_price, max_price
+    db.session.add(stats)
+    db.session.commit()
+
+def price_facets(session):
+    stats = session.query(CatalogStats).get(1)
+    buckets = session.query(PriceBucket.lower, PriceBucket.upper, PriceBucket.count).order_by(
+        PriceBucket.id).all()
+    return {
+        'total': stats.product_count if stats else 0,
+        'min_price': stats.min_price if stats else None,
+        'max_price': stats.max_price if stats else None,
+        'buckets': [{'min': bucket.lower, 'max': bucket.upper, 'count': bucket.count}
+                    for bucket in buckets]
+    }
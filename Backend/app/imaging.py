@@ -0,0 +1,38 @@
+# backend/app/imaging.py
+# Image derivatives for uploads. This runs inside the upload process pool, so
+# it must not import the Flask app: workers only need Pillow and a file path.
+import os
+
+from PIL import Image, ImageOps
+
+WEBP_QUALITY = 80
+
+
+def derivative_name(digest, width):
+    return '%s_w%d.webp' % (digest, width)
+
+
+def make_derivatives(source, folder, digest, widths):
+    """Write a WebP copy of source at each width and return {width: filename}.
+
+    Images are never upscaled, so widths wider than the original produce a
+    copy at the original size. Existing files are reused as-is, which makes
+    re-running the job for the same content a no-op.
+    """
+    derivatives = {}
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+        for width in sorted(widths):
+            filename = derivative_name(digest, width)
+            path = os.path.join(folder, filename)
+            if not os.path.exists(path):
+                image = original.copy()
+                image.thumbnail((width, width * 4), Image.LANCZOS)
+                # Write then rename so readers never see a half-written file.
+                partial = path + '.part'
+                image.save(partial, 'WEBP', quality=WEBP_QUALITY, method=4)
+                os.replace(partial, path)
+            derivatives[width] = filename
+    return derivatives
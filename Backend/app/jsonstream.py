@@ -0,0 +1,43 @@
+# backend/app/jsonstream.py
+# JSON for list endpoints: orjson when it is installed, and arrays streamed
+# a batch of rows at a time, so a response never has to be built in memory
+# as a list of dicts plus its encoded copy.
+import json
+
+from flask import Response, stream_with_context
+
+try:
+    import orjson
+except ImportError:  # optional; the json module gives the same output, slower
+    orjson = None
+
+STREAM_BATCH_SIZE = 500  # rows encoded per chunk handed to the server
+
+def dumps(value):
+    """Compact JSON, as bytes."""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(',', ':')).encode()
+
+def iter_json_items(items, batch_size=STREAM_BATCH_SIZE):
+    """Yield the comma-separated encodings of items, batch_size at a time."""
+    batch = []
+    separator = b''
+    for item in items:
+        batch.append(dumps(item))
+        if len(batch) >= batch_size:
+            yield separator + b','.join(batch)
+            separator = b','
+            batch = []
+    if batch:
+        yield separator + b','.join(batch)
+
+def iter_json_array(items):
+    yield b'['
+    yield from iter_json_items(items)
+    yield b']'
+
+def json_stream_response(chunks, status=200):
+    # stream_with_context keeps the request (and its session) alive until
+    # the last chunk, since rows are still being fetched while sending.
+    return Response(stream_with_context(chunks), status=status, mimetype='application/json')
@@ -0,0 +1,374 @@
+# backend/app/maintenance.py
+# Background upkeep of the database and upload folder:
+#
+#   expire_carts        delete carts nobody has added to in CART_EXPIRY_DAYS
+#   expire_uploads      drop chunked uploads idle for UPLOAD_SESSION_TTL
+#   analyze             refresh the planner's statistics (ANALYZE, PRAGMA optimize)
+#   checkpoint          copy the WAL back into the database file
+#   incremental_vacuum  return free pages to the file system
+#
+# Every web worker checks for due jobs once a MAINTENANCE_TICK (or run
+# `flask maintenance --loop` as a sidecar and set MAINTENANCE_ENABLED=0).
+# A job runs only in the worker that claims its row in maintenance_job, so
+# it runs once per interval whichever process gets there first.
+#
+# Requests must not wait behind a job, so each job writes in short
+# transactions with a pause between them, and stops after
+# MAINTENANCE_JOB_BUDGET seconds; what's left is done next time. Deletes are
+# batched by time rather than rows: cart lines fire the related-products
+# triggers, so a row can cost anything from microseconds to a millisecond.
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import logging
+import os
+import random
+import socket
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import bindparam, or_, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.metrics import LATENCY_BUCKETS, metrics
+from app.models import MaintenanceJob
+
+logger = logging.getLogger(__name__)
+
+STALE_CARTS = text(
+    'SELECT user_id FROM cart_item GROUP BY user_id HAVING MAX(created_at) < :cutoff'
+).bindparams(bindparam('cutoff', type_=db.DateTime))
+# Checks again that nothing was added since the carts were picked.
+DELETE_STALE_CART_LINES = text(
+    'DELETE FROM cart_item WHERE id IN ('
+    ' SELECT line.id FROM cart_item AS line WHERE line.user_id IN :users'
+    ' AND NOT EXISTS (SELECT 1 FROM cart_item AS fresh'
+    '  WHERE fresh.user_id = line.user_id AND fresh.created_at >= :cutoff)'
+    ' LIMIT :limit)'
+).bindparams(bindparam('users', expanding=True), bindparam('cutoff', type_=db.DateTime))
+STALE_UPLOADS = text(
+    'SELECT id FROM upload_session WHERE updated_at < :cutoff'
+).bindparams(bindparam('cutoff', type_=db.DateTime))
+DELETE_UPLOADS = text(
+    'DELETE FROM upload_session WHERE id IN :ids AND updated_at < :cutoff'
+).bindparams(bindparam('ids', expanding=True), bindparam('cutoff', type_=db.DateTime))
+
+CART_USERS_PER_BATCH = 100
+FIRST_BATCH_SIZE = 50
+MIN_BATCH_SIZE = 10
+INCREMENTAL_AUTO_VACUUM = 2  # PRAGMA auto_vacuum
+
+class JobRun:
+    """One run of a job: its limits and what it has done so far."""
+
+    def __init__(self, config, engine):
+        self.config = config
+        self.engine = engine
+        self.batch_size = min(FIRST_BATCH_SIZE, config['MAINTENANCE_BATCH_SIZE'])
+        self.write_target = config['MAINTENANCE_WRITE_TARGET_MS'] / 1000.0
+        self.deadline = time.monotonic() + config['MAINTENANCE_JOB_BUDGET']
+        self.rows = 0
+        self.longest_write = 0.0
+        self.writes = []
+
+    @contextmanager
+    def write(self):
+        """A connection holding the write lock, timed from getting it to letting go.
+
+        The next batch is halved if this one held the lock longer than
+        MAINTENANCE_WRITE_TARGET_MS, and doubled if it took under half.
+        """
+        with self.engine.begin() as connection:
+            # Wait for the lock first, so only the time we hold it is counted.
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+            started = time.perf_counter()
+            yield connection
+        elapsed = time.perf_counter() - started
+        self.longest_write = max(self.longest_write, elapsed)
+        self.writes.append(elapsed)
+        if elapsed > self.write_target:
+            self.batch_size = max(MIN_BATCH_SIZE, self.batch_size // 2)
+        elif elapsed < self.write_target / 2:
+            self.batch_size = min(self.config['MAINTENANCE_BATCH_SIZE'], self.batch_size * 2)
+
+    def pause(self):
+        """Let waiting requests write; return False once the time budget is spent."""
+        time.sleep(self.config['MAINTENANCE_BATCH_PAUSE'])
+        return time.monotonic() < self.deadline
+
+def expire_carts(run):
+    """Delete every line of carts whose newest line is older than CART_EXPIRY_DAYS."""
+    cutoff = datetime.utcnow() - timedelta(days=run.config['CART_EXPIRY_DAYS'])
+    with run.engine.connect() as connection:
+        users = [row.user_id for row in connection.execute(STALE_CARTS, {'cutoff': cutoff})]
+    store = current_app.extensions['cart_store']
+    for start in range(0, len(users), CART_USERS_PER_BATCH):
+        batch = users[start:start + CART_USERS_PER_BATCH]
+        # Lines the memory backend hasn't written yet must count as activity.
+        store.flush()
+        while True:
+            limit = run.batch_size
+            with run.write() as connection:
+                deleted = connection.execute(DELETE_STALE_CART_LINES, {
+                    'users': batch, 'cutoff': cutoff, 'limit': limit
+                }).rowcount
+            run.rows += deleted
+            more = deleted == limit
+            if not run.pause():
+                store.expire(batch)
+                return
+            if not more:
+                break
+        store.expire(batch)
+
+def expire_uploads(run):
+    """Drop chunked uploads idle for UPLOAD_SESSION_TTL, and partial files with no upload."""
+    from app.uploads import partial_path
+
+    cutoff = datetime.utcnow() - timedelta(seconds=run.config['UPLOAD_SESSION_TTL'])
+    with run.engine.connect() as connection:
+        stale = [row.id for row in connection.execute(STALE_UPLOADS, {'cutoff': cutoff})]
+    while stale:
+        batch, stale = stale[:run.batch_size], stale[run.batch_size:]
+        with run.write() as connection:
+            run.rows += connection.execute(DELETE_UPLOADS, {'ids': batch, 'cutoff': cutoff}).rowcount
+        for upload_id in batch:
+            remove_quietly(partial_path(upload_id))
+        if not run.pause():
+            return
+
+    # Left behind by a crash between removing a session and its file.
+    folder = os.path.dirname(partial_path('x'))
+    if not os.path.isdir(folder):
+        return
+    with run.engine.connect() as connection:
+        known = {row.id for row in connection.execute(text('SELECT id FROM upload_session'))}
+    expired_before = cutoff.timestamp()
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name not in known and os.path.getmtime(path) < expired_before:
+            remove_quietly(path)
+            run.rows += 1
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def analyze(run):
+    """Refresh sqlite_stat1, sampling ANALYZE_LIMIT rows per index."""
+    with run.write() as connection:
+        connection.exec_driver_sql('PRAGMA analysis_limit = %d' % run.config['ANALYZE_LIMIT'])
+        connection.exec_driver_sql('ANALYZE')
+        connection.exec_driver_sql('PRAGMA optimize')
+        run.rows = connection.exec_driver_sql('SELECT COUNT(*) FROM sqlite_stat1').scalar()
+
+def checkpoint(run):
+    """Copy committed WAL pages into the database, without waiting on readers or writers."""
+    with run.engine.connect() as connection:
+        busy, log, checkpointed = connection.exec_driver_sql('PRAGMA wal_checkpoint(PASSIVE)').first()
+    run.rows = max(checkpointed, 0)
+
+def incremental_vacuum(run):
+    """Give free pages back to the file system, VACUUM_PAGES at a time.
+
+    Only for databases in incremental auto-vacuum mode; `flask vacuum`
+    converts an older database.
+    """
+    with run.engine.connect() as connection:
+        if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() != INCREMENTAL_AUTO_VACUUM:
+            return
+    while True:
+        with run.write() as connection:
+            before = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+            if not before:
+                return
+            # Each freed page is a step of the statement, and sqlite3 only
+            # takes the first (fetching doesn't step a statement without
+            # columns), so it is run once per page. executescript() would
+            # take every step, but commits first: the pages would be freed
+            # outside this transaction and its timing.
+            cursor = connection.connection.cursor()
+            try:
+                for _ in range(min(before, run.config['VACUUM_PAGES'])):
+                    cursor.execute('PRAGMA incremental_vacuum(1)')
+            finally:
+                # Resets the last step, which COMMIT would otherwise refuse.
+                cursor.close()
+            run.rows += before - connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+        if not run.pause():
+            return
+
+JOBS = {
+    'expire_carts': expire_carts,
+    'expire_uploads': expire_uploads,
+    'analyze': analyze,
+    'checkpoint': checkpoint,
+    'incremental_vacuum': incremental_vacuum,
+}
+
+def worker_name():
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+def claim_job(name, interval, lease, force=False):
+    """Take the job's lease if it's free and the job is due; return whether we got it."""
+    now = datetime.utcnow()
+    table = MaintenanceJob.__table__
+    claim = {'locked_by': worker_name(), 'locked_until': now + timedelta(seconds=lease),
+             'last_started_at': now}
+    stmt = sqlite_insert(table).values(name=name, **claim)
+    due = or_(table.c.locked_until.is_(None), table.c.locked_until < now)
+    if not force:
+        due = due & or_(table.c.last_finished_at.is_(None),
+                        table.c.last_finished_at <= now - timedelta(seconds=interval))
+    try:
+        claimed = db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['name'], set_=claim, where=due
+        )).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return claimed == 1
+
+def release_job(name, result):
+    try:
+        MaintenanceJob.query.filter_by(name=name, locked_by=worker_name()).update({
+            MaintenanceJob.locked_by: None,
+            MaintenanceJob.locked_until: None,
+            MaintenanceJob.last_finished_at: datetime.utcnow(),
+            MaintenanceJob.last_seconds: result['seconds'],
+            MaintenanceJob.last_rows: result['rows'],
+            MaintenanceJob.last_longest_write: result['longest_write'],
+            MaintenanceJob.last_error: result['error'],
+        }, synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def run_claimed_job(name):
+    """Run a job whose lease we hold; record and return how it went."""
+    config = current_app.config
+    run = JobRun(config, db.get_engine(current_app))
+    started = time.perf_counter()
+    error = None
+    try:
+        JOBS[name](run)
+    except Exception as e:
+        logger.exception('Maintenance job %s failed', name)
+        error = str(e)
+    result = {
+        'job': name,
+        'rows': run.rows,
+        'seconds': round(time.perf_counter() - started, 3),
+        'longest_write': round(run.longest_write, 4),
+        'error': error,
+    }
+    labels = (('job', name),)
+    metrics.inc('maintenance_job_runs_total', labels + (('status', 'error' if error else 'ok'),))
+    metrics.inc('maintenance_job_seconds_total', labels, result['seconds'])
+    metrics.inc('maintenance_job_rows_total', labels, run.rows)
+    for seconds in run.writes:
+        metrics.observe('maintenance_write_seconds', labels, seconds, LATENCY_BUCKETS)
+    logger.info('Maintenance job %s: %d rows in %.3fs, longest write %.1f ms%s', name, run.rows,
+                result['seconds'], run.longest_write * 1000, ', failed: %s' % error if error else '')
+    release_job(name, result)
+    return result
+
+def lease_seconds(config):
+    # Past the budget, a job only finishes its current batch.
+    return config['MAINTENANCE_JOB_BUDGET'] + 300
+
+def run_due_jobs(names=None, force=False):
+    """Run the jobs (all, or those named) that are due and not running elsewhere."""
+    config = current_app.config
+    results = []
+    for name, interval in config['MAINTENANCE_JOBS'].items():
+        if names is not None and name not in names:
+            continue
+        if claim_job(name, interval, lease_seconds(config), force):
+            results.append(run_claimed_job(name))
+    return results
+
+def job_status():
+    rows = {row.name: row for row in MaintenanceJob.query.all()}
+    jobs = []
+    for name, interval in current_app.config['MAINTENANCE_JOBS'].items():
+        row = rows.get(name)
+        jobs.append({
+            'job': name,
+            'interval': interval,
+            'running_on': row.locked_by if row else None,
+            'last_started_at': row.last_started_at.isoformat() if row and row.last_started_at else None,
+            'last_finished_at': row.last_finished_at.isoformat() if row and row.last_finished_at else None,
+            'last_seconds': row.last_seconds if row else None,
+            'last_rows': row.last_rows if row else None,
+            'last_longest_write': row.last_longest_write if row else None,
+            'last_error': row.last_error if row else None,
+        })
+    return jobs
+
+class MaintenanceScheduler:
+    """Checks for due jobs every MAINTENANCE_TICK seconds on a daemon thread.
+
+    The thread starts with the worker's first request, so neither building
+    the app nor a prefork master runs it.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget the thread and executor; a forked child inherits neither."""
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='maintenance-run')
+
+    def init_app(self, app):
+        if app.config['MAINTENANCE_ENABLED']:
+            app.before_request(lambda: self.start(app))
+
+    def start(self, app):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(app, self._stopped),
+                                                name='maintenance', daemon=True)
+                self._thread.start()
+
+    def _run(self, app, stopped):
+        tick = app.config['MAINTENANCE_TICK']
+        # Spread the workers' checks over the tick.
+        while not stopped.wait(tick * random.uniform(0.5, 1.5)):
+            try:
+                with app.app_context():
+                    run_due_jobs()
+            except Exception:
+                logger.exception('Maintenance check failed; retrying in %ds', tick)
+
+    def run_now(self, app, name):
+        """Claim a job and run it on a background thread; return False if it's running."""
+        if not claim_job(name, 0, lease_seconds(app.config), force=True):
+            return False
+        self._executor.submit(self._run_claimed, app, name)
+        return True
+
+    def _run_claimed(self, app, name):
+        with app.app_context():
+            run_claimed_job(name)
+
+    def stop(self):
+        self._stopped.set()
+
+maintenance = MaintenanceScheduler()
+metrics.describe('maintenance_job_runs_total', 'counter', 'Maintenance job runs by job and status.')
+metrics.describe('maintenance_job_seconds_total', 'counter', 'Time spent in maintenance jobs.')
+metrics.describe('maintenance_job_rows_total', 'counter', 'Rows (or pages) touched by maintenance jobs.')
+metrics.describe('maintenance_write_seconds', 'histogram',
+                 'Write transactions of maintenance jobs, i.e. how long they held the write lock.')
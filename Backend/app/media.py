@@ -0,0 +1,89 @@
+# backend/app/media.py
+# Response headers for files under /uploads, shared by the Flask view and
+# the asyncio server. Uploads are stored under their content hash (see
+# uploads.py), so a URL's bytes never change and browsers may cache them for
+# good; files from before that get a short lifetime and are revalidated.
+from email.utils import formatdate, parsedate_to_datetime
+import mimetypes
+import os
+import re
+
+# <32 hex digits>.<ext>, or a derivative <32 hex digits>_w<width>.webp
+CONTENT_ADDRESSED = re.compile(r'^([0-9a-f]{32}(?:_w\d+)?)\.[a-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MEDIA_OFFLOAD_MODES = ('x-sendfile', 'x-accel-redirect')
+
+def is_content_addressed(filename):
+    return CONTENT_ADDRESSED.match(filename) is not None
+
+def media_etag(filename, stat_result):
+    """The content hash in the name, else one made from the file's mtime and size."""
+    match = CONTENT_ADDRESSED.match(filename)
+    if match is not None:
+        return match.group(1)
+    return '%x-%x' % (stat_result.st_mtime_ns, stat_result.st_size)
+
+def media_cache_control(filename, max_age):
+    if is_content_addressed(filename):
+        return 'public, max-age=%d, immutable' % IMMUTABLE_MAX_AGE
+    return 'public, max-age=%d' % max_age
+
+def media_headers(filename, stat_result, max_age):
+    return {
+        'Cache-Control': media_cache_control(filename, max_age),
+        'ETag': '"%s"' % media_etag(filename, stat_result),
+        'Last-Modified': formatdate(stat_result.st_mtime, usegmt=True),
+        'Accept-Ranges': 'bytes',
+    }
+
+def media_type(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+def check_media_offload(mode):
+    if mode and mode not in MEDIA_OFFLOAD_MODES:
+        raise ValueError('MEDIA_OFFLOAD must be empty or one of %s, not %r'
+                         % (', '.join(MEDIA_OFFLOAD_MODES), mode))
+
+def offload_header(mode, accel_location, folder, filename):
+    """(header, value) telling the front-end server to send the file itself, or None."""
+    if mode == 'x-sendfile':
+        return 'X-Sendfile', os.path.join(os.path.abspath(folder), filename)
+    if mode == 'x-accel-redirect':
+        return 'X-Accel-Redirect', accel_location.rstrip('/') + '/' + filename
+    return None
+
+def is_not_modified(if_none_match, if_modified_since, etag, mtime):
+    """Whether a GET with these request headers can be answered with 304."""
+    if if_none_match is not None:
+        # Weak comparison, as RFC 9110 asks for If-None-Match.
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or any(tag.lstrip('W/') == '"%s"' % etag for tag in tags)
+    if if_modified_since is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def parse_byte_range(header, size):
+    """The (start, end) inclusive byte range a Range header asks for.
+
+    None means send the whole file (no header, a syntax we don't handle, or
+    several ranges); False means the range can't be satisfied (416).
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start, _, end = header[6:].strip().partition('-')
+    try:
+        if not start:
+            length = int(end)
+            if length <= 0:
+                return False
+            return max(0, size - length), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
@@ -0,0 +1,197 @@
+# backend/app/metrics.py
+# Request and SQL instrumentation, exposed in the Prometheus text format at
+# /metrics. Metrics are kept per process: under gunicorn each scrape sees the
+# worker that served it, so scrape every worker or sum over the pid label.
+from bisect import bisect_left
+from contextlib import contextmanager
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+slow_query_logger = logging.getLogger('app.sql.slow')
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """Counters and histograms keyed by (name, labels), behind one lock."""
+
+    def __init__(self):
+        self.slow_query_seconds = 0.1
+        self.breakdown_sample_rate = 0.0
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, engines):
+        self.slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000.0
+        self.breakdown_sample_rate = app.config['REQUEST_BREAKDOWN_SAMPLE_RATE']
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    # Request hooks
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_statements = 0
+        g.metrics_sql_seconds = 0.0
+        g.metrics_phases = {}
+
+    def _after_request(self, response):
+        started = getattr(g, 'metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        # The route pattern, not the path, so ids don't become label values.
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        labels = (('endpoint', endpoint), ('method', request.method))
+
+        self.inc('http_requests_total', labels + (('status', str(response.status_code)),))
+        self.observe('http_request_duration_seconds', labels, elapsed, LATENCY_BUCKETS)
+        self.observe('http_request_sql_statements', labels, g.metrics_statements, STATEMENT_BUCKETS)
+        self.inc('http_request_sql_seconds_total', labels, g.metrics_sql_seconds)
+        for phase, seconds in g.metrics_phases.items():
+            self.inc('http_request_phase_seconds_total', labels + (('phase', phase),), seconds)
+
+        if self.breakdown_sample_rate and random.random() < self.breakdown_sample_rate:
+            response.headers['Server-Timing'] = self._server_timing(elapsed)
+        return response
+
+    def _server_timing(self, elapsed):
+        entries = ['total;dur=%.2f' % (elapsed * 1000),
+                   'db;dur=%.2f;desc="%d queries"' % (g.metrics_sql_seconds * 1000, g.metrics_statements)]
+        entries.extend('%s;dur=%.2f' % (phase, seconds * 1000)
+                       for phase, seconds in g.metrics_phases.items())
+        return ', '.join(entries)
+
+    # SQL hooks
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        self.observe('db_statement_duration_seconds', (('operation', operation),),
+                     elapsed, LATENCY_BUCKETS)
+        if has_request_context() and hasattr(g, 'metrics_statements'):
+            g.metrics_statements += 1
+            g.metrics_sql_seconds += elapsed
+        if elapsed >= self.slow_query_seconds:
+            self.inc('db_slow_statements_total', (('operation', operation),))
+            slow_query_logger.warning('%.1f ms %s [%s redacted]', elapsed * 1000, redact(statement),
+                                      describe_parameters(parameters, executemany))
+
+    # Exposition
+
+    def render(self):
+        """The current values in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count, h.buckets))
+                                for key, h in self._histograms.items())
+        pid = (('pid', str(os.getpid())),)
+        lines, seen = [], set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                help_kind, text = self._help.get(name, (kind, name))
+                lines.append('# HELP %s %s' % (name, text))
+                lines.append('# TYPE %s %s' % (name, help_kind))
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append('%s%s %s' % (name, format_labels(labels + pid), format_value(value)))
+        for (name, labels), (counts, total, count, buckets) in histograms:
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                le = (('le', bound if bound == '+Inf' else format_value(bound)),)
+                lines.append('%s_bucket%s %d' % (name, format_labels(labels + pid + le), cumulative))
+            lines.append('%s_sum%s %s' % (name, format_labels(labels + pid), format_value(total)))
+            lines.append('%s_count%s %d' % (name, format_labels(labels + pid), count))
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+metrics.describe('http_requests_total', 'counter', 'Requests by endpoint, method and status.')
+metrics.describe('http_request_duration_seconds', 'histogram', 'Time spent handling a request.')
+metrics.describe('http_request_sql_statements', 'histogram', 'SQL statements run per request.')
+metrics.describe('http_request_sql_seconds_total', 'counter', 'Time spent in SQL by endpoint.')
+metrics.describe('http_request_phase_seconds_total', 'counter',
+                 'Time spent in instrumented phases (auth, jwt, ...) by endpoint.')
+metrics.describe('db_statement_duration_seconds', 'histogram', 'SQL statement latency.')
+metrics.describe('db_slow_statements_total', 'counter', 'Statements slower than SLOW_QUERY_MS.')
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to the current request's breakdown."""
+    if not has_request_context() or not hasattr(g, 'metrics_phases'):
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.metrics_phases[phase] = g.metrics_phases.get(phase, 0.0) + time.perf_counter() - started
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+def redact(statement):
+    # Bound parameters are never logged, and literals inlined into the SQL
+    # text are masked too.
+    return _literals.sub('?', ' '.join(statement.split()))[:1000]
+
+def describe_parameters(parameters, executemany):
+    if executemany:
+        return '%d parameter sets' % len(parameters)
+    return '%d parameters' % len(parameters or ())
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\')
+                                          .replace('"', '\\"').replace('\n', '\\n'))
+                             for name, value in labels)
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,7 @@
+# backend/app/models/__init__.py
+from app.models.user import User, AuthMeta
+from app.models.product import Product, CatalogMeta, PriceBucket, CatalogStats, ProductPair
+from app.models.media import MediaAsset, UploadSession
+from app.models.cart import CartItem, CartSize
+from app.models.order import Order, OrderItem
+from app.models.maintenance import MaintenanceJob
@@ -0,0 +1,26 @@
+# backend/app/models/cart.py
+from app import db
+from datetime import datetime
+
+class CartItem(db.Model):
+    # One row per (user, product); cart writes upsert against this index.
+    # The second one returns a user's cart already in display order, so a
+    # streamed cart starts sending without sorting it first.
+    __table_args__ = (
+        db.Index('uq_cart_item_user_product', 'user_id', 'product_id', unique=True),
+        db.Index('ix_cart_item_user_created_at', 'user_id', 'created_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, default=1)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CartSize(db.Model):
+    # Lines per cart, maintained by the same triggers as ProductPair so they
+    # can tell in one lookup whether a cart is small enough to count.
+    __tablename__ = 'cart_size'
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    lines = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,19 @@
+# backend/app/models/maintenance.py
+from app import db
+
+class MaintenanceJob(db.Model):
+    # One row per background job: who holds it (a lease, so a crashed
+    # worker's claim runs out) and how its last run went. Every worker
+    # reads the schedule from here, so each job runs once per interval
+    # however many processes are up.
+    __tablename__ = 'maintenance_job'
+
+    name = db.Column(db.String(50), primary_key=True)
+    locked_by = db.Column(db.String(100))
+    locked_until = db.Column(db.DateTime)
+    last_started_at = db.Column(db.DateTime)
+    last_finished_at = db.Column(db.DateTime)
+    last_seconds = db.Column(db.Float)
+    last_rows = db.Column(db.Integer)
+    last_longest_write = db.Column(db.Float)  # seconds, the longest write transaction
+    last_error = db.Column(db.Text)
@@ -0,0 +1,27 @@
+# backend/app/models/media.py
+from app import db
+from datetime import datetime
+
+class MediaAsset(db.Model):
+    # One row per distinct uploaded file, keyed by content hash, so uploading
+    # the same picture twice stores and processes it once.
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), unique=True, nullable=False)
+    filename = db.Column(db.String(200), unique=True, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    derivatives = db.Column(db.JSON)  # {width: filename}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UploadSession(db.Model):
+    # A chunked upload in progress. The bytes received so far are in
+    # UPLOAD_FOLDER/.partial/<id>; received only moves forward once they
+    # are on disk, so it is where a client resumes.
+    __tablename__ = 'upload_session'
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    extension = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -3,10 +3,22 @@ from app import db
 from datetime import datetime
 
 class Product(db.Model):
+    # Composite indexes back the keyset pagination in get_products: each sort
+    # order walks one of them and the trailing id breaks ties between equal keys.
+    __table_args__ = (
+        db.Index('ix_product_created_at_id', 'created_at', 'id'),
+        db.Index('ix_product_price_id', 'price', 'id'),
+        db.Index('ix_product_name', 'name'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     price = db.Column(db.Float, nullable=False)
-    image = db.Column(db.String(200), nullable=False)
+    image = db.Column(db.String(500))
+    thumbnails = db.Column(db.JSON)  # {width: url} of the image's derivatives
+    # Units available to sell; NULL means stock is not tracked for the product.
+    # Checkout only ever changes it with a conditional UPDATE (see orders.py).
+    stock = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_dict(self):
@@ -16,4 +28,39 @@ class Product(db.Model):
             'price': self.price,
             'image': self.image,
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+class CatalogMeta(db.Model):
+    # Single row whose version is bumped in the same transaction as every
+    # product write, so all workers agree on when cached pages went stale.
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class PriceBucket(db.Model):
+    # Product counts per price range, kept current by triggers on product
+    # (see facets.py). lower is inclusive, upper exclusive; NULL is unbounded.
+    id = db.Column(db.Integer, primary_key=True)
+    lower = db.Column(db.Float)
+    upper = db.Column(db.Float)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class CatalogStats(db.Model):
+    # Single row maintained by the same triggers as PriceBucket.
+    id = db.Column(db.Integer, primary_key=True)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    min_price = db.Column(db.Float)
+    max_price = db.Column(db.Float)
+
+class ProductPair(db.Model):
+    # How many carts (of at most RELATED_MAX_CART_LINES lines) hold both
+    # products, stored once in each direction and kept current by triggers
+    # on cart_item (see related.py). The second index turns "top K for a
+    # product" into a K-row index seek.
+    __tablename__ = 'product_pair'
+    __table_args__ = (
+        db.Index('ix_product_pair_top', 'product_id', 'count', 'other_id'),
+    )
+
+    product_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    other_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
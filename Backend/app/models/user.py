@@ -0,0 +1,18 @@
+# backend/app/models/user.py
+from app import db
+from datetime import datetime
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password = db.Column(db.String(200), nullable=False)
+    is_admin = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AuthMeta(db.Model):
+    # Single row whose version the triggers in auth.py bump whenever a
+    # user's admin flag changes or a user is deleted, by any process or
+    # statement, so every worker knows its cached principals went stale.
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,126 @@
+# backend/app/orders.py
+# Checkout: turn a user's cart into an order, reserving stock on the way.
+from sqlalchemy import bindparam
+
+from app import db
+from app.cartstore import get_cart_store
+from app.models import CartItem, Order, OrderItem, Product
+
+class CheckoutError(Exception):
+    def __init__(self, message, status=409, product_id=None):
+        super().__init__(message)
+        self.status = status
+        self.product_id = product_id
+
+def reserve_stock(product_id, quantity):
+    """Take quantity units of a product; return False if there aren't enough.
+
+    The check and the decrement are one statement, so two buyers can never
+    both see the last unit: the second UPDATE matches no row. Products with
+    untracked (NULL) stock always match and stay NULL.
+    """
+    result = db.session.execute(
+        Product.__table__.update()
+        .where(Product.id == product_id)
+        .where(db.or_(Product.stock.is_(None), Product.stock >= quantity))
+        .values(stock=Product.stock - quantity)
+    )
+    return result.rowcount == 1
+
+def reservation_error(product_id):
+    """The CheckoutError for a line reserve_stock refused: product gone, or too few left."""
+    if db.session.query(Product.id).filter(Product.id == product_id).first() is None:
+        return CheckoutError('Product is no longer available', product_id=product_id)
+    return CheckoutError('Insufficient stock', product_id=product_id)
+
+def place_order(user_id):
+    """Create an order from the user's cart and commit it, or raise CheckoutError."""
+    # A write-behind cart store may hold changes cart_item hasn't seen yet.
+    store = get_cart_store()
+    store.flush(user_id)
+
+    # Read outside the write transaction; everything below holds SQLite's
+    # write lock, so it is kept to a handful of indexed statements.
+    lines = db.session.query(CartItem.product_id, CartItem.quantity).filter(
+        CartItem.user_id == user_id,
+        CartItem.quantity > 0
+    ).order_by(CartItem.product_id).all()
+    if not lines:
+        raise CheckoutError('Cart is empty', status=400)
+
+    try:
+        for line in lines:
+            if not reserve_stock(line.product_id, line.quantity):
+                raise reservation_error(line.product_id)
+
+        # Read after reserving, under the write lock, so the prices charged
+        # are the ones current when the stock was taken. Every product is
+        # here: reserve_stock matched its row.
+        products = {row.id: row for row in db.session.query(
+            Product.id, Product.name, Product.price
+        ).filter(Product.id.in_([line.product_id for line in lines]))}
+
+        order = Order(
+            user_id=user_id,
+            status='placed',
+            total=sum(products[line.product_id].price * line.quantity for line in lines)
+        )
+        db.session.add(order)
+        db.session.flush()
+        items = [{
+            'order_id': order.id,
+            'product_id': line.product_id,
+            'name': products[line.product_id].name,
+            'price': products[line.product_id].price,
+            'quantity': line.quantity
+        } for line in lines]
+        db.session.execute(OrderItem.__table__.insert(), items)
+
+        # Take the ordered quantities out of the cart rather than deleting it,
+        # so an add that raced with checkout is kept.
+        cart = CartItem.__table__
+        db.session.execute(
+            cart.update()
+            .where(cart.c.user_id == user_id)
+            .where(cart.c.product_id == bindparam('ordered_product_id'))
+            .values(quantity=cart.c.quantity - bindparam('ordered_quantity')),
+            [{'ordered_product_id': line.product_id, 'ordered_quantity': line.quantity}
+             for line in lines]
+        )
+        CartItem.query.filter(
+            CartItem.user_id == user_id,
+            CartItem.quantity <= 0
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    store.checked_out(user_id, lines)
+    return order_payload(order, items)
+
+def order_payload(order, items):
+    return {
+        'id': order.id,
+        'status': order.status,
+        'total': order.total,
+        'created_at': order.created_at.isoformat(),
+        'items': [{
+            'product_id': item['product_id'],
+            'name': item['name'],
+            'price': item['price'],
+            'quantity': item['quantity']
+        } for item in items]
+    }
+
+def user_orders(user_id, limit):
+    orders = Order.query.filter_by(user_id=user_id).order_by(
+        Order.created_at.desc(), Order.id.desc()).limit(limit).all()
+    items = {}
+    if orders:
+        for row in db.session.query(
+            OrderItem.order_id, OrderItem.product_id, OrderItem.name, OrderItem.price,
+            OrderItem.quantity
+        ).filter(OrderItem.order_id.in_([order.id for order in orders])).order_by(OrderItem.id):
+            items.setdefault(row.order_id, []).append(row._asdict())
+    return [order_payload(order, items.get(order.id, [])) for order in orders]
@@ -0,0 +1,68 @@
+# backend/app/passwords.py
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from flask import jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class HashPoolSaturated(Exception):
+    pass
+
+class HashPool:
+    """Runs password hashing on a few dedicated threads.
+
+    Slow hashes can then only occupy HASH_WORKERS threads instead of every
+    request thread. Once HASH_QUEUE_LIMIT more are waiting, further work is
+    refused at once rather than queued behind them.
+    """
+
+    def __init__(self, workers=2, queue_limit=16):
+        self.rejected = 0
+        self._configure(workers, queue_limit)
+
+    def init_app(self, app):
+        self._configure(app.config['HASH_WORKERS'], app.config['HASH_QUEUE_LIMIT'])
+
+    def reset(self):
+        """Start over with fresh threads; a forked child inherits none."""
+        self._configure(self._workers, self._queue_limit)
+
+    def _configure(self, workers, queue_limit):
+        self._workers = workers
+        self._queue_limit = queue_limit
+        # Threads are only started by the first submit, so building the
+        # executor here is cheap and safe before a fork.
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+
+    def run(self, fn, *args, timeout=None):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashPoolSaturated()
+        slots = self._slots
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda done: slots.release())
+        return future.result(timeout)
+
+hash_pool = HashPool()
+
+def hash_method(pwhash):
+    return pwhash.split('$', 1)[0]
+
+def verify_password(pwhash, password, method):
+    """Check a password; also return a new hash if pwhash used another method."""
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if hash_method(pwhash) != method:
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+def busy_response():
+    response = jsonify({'message': 'Server is busy, please retry'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
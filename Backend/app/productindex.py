@@ -0,0 +1,438 @@
+# backend/app/productindex.py
+# An in-memory, column-per-field copy of the product list that answers
+# GET /api/products (any sort, price range, name prefix and cursor) without
+# a query. Each field is one array indexed by a product's slot, and each
+# sort order is an array of slots sorted by (key, id), so a page is a
+# binary search to the cursor followed by a short walk.
+#
+# The index is labelled with the catalog version it was read at and only
+# answers for that version; otherwise the caller falls back to SQL and the
+# index reloads in the background. Single-product writes in this process
+# are applied in place; any other write (bulk import, bulk update, another
+# worker) moves the version past it and causes a reload.
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import heapq
+import logging
+import sys
+import threading
+import time
+
+from sqlalchemy import select
+
+from app import read_session
+from app.catalog import CATALOG_VERSION_QUERY, PRODUCT_SORTS, decode_cursor, name_prefix_upper_bound
+from app.models import Product
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_INDEX_QUERY = select(Product.id, Product.name, Product.price, Product.image,
+                             Product.thumbnails, Product.created_at)
+# A row of the index, with the attributes product_page_payload reads.
+IndexedProduct = namedtuple('IndexedProduct', ['id', 'name', 'price', 'image', 'thumbnails', 'created_at'])
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+NO_DATE = -2 ** 63  # created_at IS NULL, which SQLite sorts first
+MIN_ID, MAX_ID = -2 ** 63, 2 ** 63 - 1
+# Relative cost per row of collecting the rows a filter on another column
+# matches and picking the page from them, against walking the sort order
+# and testing each row (see ProductColumns.page).
+COLLECT_COST = 4
+LOAD_RETRY_SECONDS = 30
+MAX_REPORTED_IDS = 20
+
+def to_micros(created_at):
+    return NO_DATE if created_at is None else (created_at - EPOCH) // MICROSECOND
+
+def from_micros(micros):
+    return None if micros == NO_DATE else EPOCH + micros * MICROSECOND
+
+class ProductColumns:
+    """The catalog as parallel arrays, plus one array of slots per sort key."""
+
+    def __init__(self, rows=()):
+        self.ids = array('q')
+        self.prices = array('d')
+        self.created = array('q')  # microseconds since the epoch
+        self.names = []
+        self.images = []
+        self.thumbnails = []
+        self.slots = {}  # product id -> slot
+        self.free = []  # slots of deleted products
+        ids, prices, created, names = self.ids, self.prices, self.created, self.names
+        for product_id, name, price, image, thumbnails, created_at in rows:
+            self.slots[product_id] = len(ids)
+            ids.append(product_id)
+            prices.append(price)
+            created.append(to_micros(created_at))
+            names.append(name)
+            # Many products share an image path (or have none).
+            self.images.append(sys.intern(image) if image else image)
+            self.thumbnails.append(thumbnails)
+
+        self.keys = {
+            'created_at': lambda slot: (created[slot], ids[slot]),
+            'price': lambda slot: (prices[slot], ids[slot]),
+            'name': lambda slot: (names[slot], ids[slot]),
+        }
+        self.orders = {column: array('i', sorted(self.slots.values(), key=key))
+                       for column, key in self.keys.items()}
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _new_slot(self):
+        if self.free:
+            return self.free.pop()
+        self.ids.append(0)
+        self.prices.append(0.0)
+        self.created.append(0)
+        self.names.append(None)
+        self.images.append(None)
+        self.thumbnails.append(None)
+        return len(self.ids) - 1
+
+    def _set(self, slot, row):
+        self.ids[slot] = row.id
+        self.prices[slot] = row.price
+        self.created[slot] = to_micros(row.created_at)
+        self.names[slot] = row.name
+        self.images[slot] = sys.intern(row.image) if row.image else row.image
+        self.thumbnails[slot] = row.thumbnails
+        self.slots[row.id] = slot
+
+    def _link(self, slot):
+        for column, order in self.orders.items():
+            insort(order, slot, key=self.keys[column])
+
+    def _unlink(self, slot):
+        for column, order in self.orders.items():
+            key = self.keys[column]
+            del order[bisect_left(order, key(slot), key=key)]
+
+    def upsert(self, row):
+        slot = self.slots.get(row.id)
+        if slot is None:
+            slot = self._new_slot()
+        else:
+            self._unlink(slot)
+        self._set(slot, row)
+        self._link(slot)
+
+    def delete(self, product_id):
+        slot = self.slots.pop(product_id, None)
+        if slot is None:
+            return
+        self._unlink(slot)
+        self.names[slot] = self.images[slot] = self.thumbnails[slot] = None
+        self.free.append(slot)
+
+    def row(self, slot):
+        return IndexedProduct(self.ids[slot], self.names[slot], self.prices[slot], self.images[slot],
+                              self.thumbnails[slot], from_micros(self.created[slot]))
+
+    def _bounds(self, column, low, high):
+        """Positions [lo, hi) of the column's order holding keys from low to high inclusive."""
+        order, key = self.orders[column], self.keys[column]
+        lo = 0 if low is None else bisect_left(order, (low, MIN_ID), key=key)
+        hi = len(order) if high is None else bisect_right(order, (high, MAX_ID), key=key)
+        return lo, hi
+
+    def page(self, sort, limit, min_price=None, max_price=None, prefix='', cursor=None):
+        """The rows product_page_statement would return, or raise ValueError for a bad cursor."""
+        column, descending = PRODUCT_SORTS[sort]
+        order, key = self.orders[column], self.keys[column]
+        lo, hi = 0, len(order)
+        if cursor:
+            position, last_id = decode_cursor(cursor, sort)
+            if column == 'created_at':
+                position = to_micros(position)
+                # (NULL, id) compares as NULL in SQL, so no page after the
+                # first holds a product without a date.
+                lo = bisect_right(order, (NO_DATE, MAX_ID), key=key)
+            if descending:
+                hi = bisect_left(order, (position, last_id), lo, key=key)
+            else:
+                lo = bisect_right(order, (position, last_id), lo, key=key)
+
+        upper = name_prefix_upper_bound(prefix) if prefix else None
+        ranges = {}
+        if min_price is not None or max_price is not None:
+            ranges['price'] = self._bounds('price', min_price, max_price)
+        if prefix:
+            # Names from prefix up to, but not including, upper.
+            ranges['name'] = (self._bounds('name', prefix, None)[0],
+                              bisect_left(self.orders['name'], (upper, MIN_ID), key=self.keys['name']))
+        if column in ranges:
+            lo, hi = max(lo, ranges[column][0]), min(hi, ranges[column][1])
+        if lo >= hi:
+            return []
+
+        prices, names = self.prices, self.names
+        def matches(slot):
+            price, name = prices[slot], names[slot]
+            return ((min_price is None or price >= min_price)
+                    and (max_price is None or price <= max_price)
+                    and (upper is None or prefix <= name < upper))
+
+        others = sorted((end - start, other, start, end) for other, (start, end) in ranges.items()
+                        if other != column)
+        # A walk down the sort order finds limit + 1 of k matches among n
+        # rows after about (limit + 1) * n / k of them; collecting the k
+        # rows in the narrowest other filter's range costs about k. Walks
+        # are cheaper per row, but can't be cut short when matches cluster
+        # at the far end.
+        if others and others[0][0] ** 2 * COLLECT_COST < (limit + 1) * len(order):
+            _, other, start, end = others[0]
+            first, last = key(order[lo]), key(order[hi - 1])
+            slots = [slot for slot in self.orders[other][start:end]
+                     if matches(slot) and first <= key(slot) <= last]
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            slots = pick(limit + 1, slots, key=key)
+        else:
+            slots = []
+            for position in (range(hi - 1, lo - 1, -1) if descending else range(lo, hi)):
+                slot = order[position]
+                if matches(slot):
+                    slots.append(slot)
+                    if len(slots) > limit:
+                        break
+        return [self.row(slot) for slot in slots]
+
+    def memory(self):
+        """Bytes held by the arrays, lists and the objects in them."""
+        seen = set()
+        def size(*objects):
+            total = 0
+            for obj in objects:
+                if obj is None or id(obj) in seen:
+                    continue
+                seen.add(id(obj))
+                total += sys.getsizeof(obj)
+                if isinstance(obj, dict):
+                    total += sum(size(k, v) for k, v in obj.items())
+                elif isinstance(obj, list):
+                    total += sum(size(item) for item in obj)
+            return total
+
+        columns = {
+            'ids': size(self.ids),
+            'prices': size(self.prices),
+            'created_at': size(self.created),
+            'names': size(self.names),
+            'images': size(self.images),
+            'thumbnails': size(self.thumbnails),
+            'slots': size(self.slots, self.free),
+            'orders': size(*self.orders.values()),
+        }
+        total = sum(columns.values())
+        return {
+            'bytes': total,
+            'bytes_per_product': round(total / len(self), 1) if len(self) else None,
+            'columns': columns,
+        }
+
+    def check_orders(self):
+        """Whether every sort order holds each live slot once, strictly increasing."""
+        live = sorted(self.slots.values())
+        for column, order in self.orders.items():
+            key = self.keys[column]
+            if sorted(order) != live:
+                return False
+            if any(key(a) >= key(b) for a, b in zip(order, order[1:])):
+                return False
+        return True
+
+class ProductIndex:
+    """The ProductColumns for one catalog version, swapped whole on reload.
+
+    Disabled unless PRODUCT_INDEX_ENABLED; the first request of each worker
+    starts the load, so neither building the app nor a prefork master reads
+    the catalog.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._app = None
+        self.reset()
+
+    def reset(self):
+        """Drop the columns and executor; a forked child loads its own."""
+        self._columns = None
+        self._version = None
+        self._loading = False
+        self._failed_at = None
+        self._last_load = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='product-index')
+
+    def init_app(self, app):
+        self.enabled = app.config['PRODUCT_INDEX_ENABLED']
+        self._app = app
+        if self.enabled:
+            app.before_request(self.start)
+
+    def start(self):
+        if self._columns is None and not self._loading:
+            self.refresh()
+
+    def page(self, version, **params):
+        """Rows for a page of the product list at version, or None if the index can't say."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._columns is not None and self._version == version:
+                return self._columns.page(**params)
+        return None
+
+    def apply(self, version, product=None, deleted_id=None):
+        """Apply a committed write of one product that moved the catalog to version."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._version is not None and self._version >= version:
+                return  # a reload already read it
+            if self._columns is not None and self._version == version - 1:
+                if product is not None:
+                    self._columns.upsert(IndexedProduct(product.id, product.name, product.price,
+                                                        product.image, product.thumbnails,
+                                                        product.created_at))
+                else:
+                    self._columns.delete(deleted_id)
+                self._version = version
+                return
+        # Another write got in between; read the whole catalog again.
+        self.refresh(version)
+
+    def claim_load(self, version=None):
+        """Whether the caller should load the catalog at version (or later) now."""
+        with self._lock:
+            if self._loading:
+                return False
+            if version is not None and self._version is not None and self._version >= version:
+                return False
+            if self._failed_at is not None and time.monotonic() - self._failed_at < LOAD_RETRY_SECONDS:
+                return False
+            self._loading = True
+            return True
+
+    def refresh(self, version=None):
+        """Reload in the background if the index is older than version."""
+        if self.enabled and self.claim_load(version):
+            self._executor.submit(self._load, self._app)
+
+    def load(self, app):
+        """Load the catalog now, on this thread."""
+        if self.claim_load():
+            self._load(app)
+
+    def _load(self, app):
+        started = time.perf_counter()
+        try:
+            with app.app_context():
+                # Version first: rows committed after it make the index newer
+                # than its label says, which the next bump corrects, never older.
+                version = read_session.execute(CATALOG_VERSION_QUERY).scalar()
+                rows = read_session.execute(PRODUCT_INDEX_QUERY).all()
+            self.replace(version, rows, started)
+        except Exception as e:
+            logger.exception('Loading the product index failed; retrying in %ds', LOAD_RETRY_SECONDS)
+            self.load_failed(e, started)
+
+    def replace(self, version, rows, started):
+        """Swap in columns built from rows read at version (after a claim_load)."""
+        columns = ProductColumns(rows)
+        with self._lock:
+            # Writes applied while we read may have moved past version.
+            if self._version is None or version >= self._version:
+                self._columns, self._version = columns, version
+            self._loading = False
+            self._failed_at = None
+            self._last_load = {
+                'at': time.time(),
+                'version': version,
+                'products': len(columns),
+                'seconds': round(time.perf_counter() - started, 3),
+                'error': None,
+            }
+        logger.info('Product index loaded: %d products at catalog version %s in %.2fs',
+                    len(columns), version, self._last_load['seconds'])
+
+    def load_failed(self, error, started):
+        with self._lock:
+            self._loading = False
+            self._failed_at = time.monotonic()
+            self._last_load = {
+                'at': time.time(),
+                'version': None,
+                'products': None,
+                'seconds': round(time.perf_counter() - started, 3),
+                'error': str(error),
+            }
+
+    def status(self):
+        with self._lock:
+            columns = self._columns
+            report = {
+                'enabled': self.enabled,
+                'version': self._version,
+                'products': len(columns) if columns is not None else None,
+                'loading': self._loading,
+                'last_load': self._last_load,
+            }
+            report['memory'] = columns.memory() if columns is not None else None
+        return report
+
+    def check(self, table_version, rows):
+        """Compare the index with rows read from the product table at table_version.
+
+        Differences are only errors when the index is at that version too;
+        otherwise they are the writes it has yet to load.
+        """
+        missing, mismatched = [], []
+        with self._lock:
+            columns, version = self._columns, self._version
+            if columns is None:
+                return None
+            seen = set()
+            for row in rows:
+                seen.add(row.id)
+                slot = columns.slots.get(row.id)
+                if slot is None:
+                    missing.append(row.id)
+                elif columns.row(slot) != (row.id, row.name, row.price, row.image,
+                                           row.thumbnails, row.created_at):
+                    mismatched.append(row.id)
+            extra = sorted(set(columns.slots) - seen)
+            orders_ok = columns.check_orders()
+            indexed = len(columns)
+        current = version == table_version
+        return {
+            'version': version,
+            'table_version': table_version,
+            'current': current,
+            'products': len(seen),
+            'indexed': indexed,
+            'missing': missing[:MAX_REPORTED_IDS],
+            'extra': extra[:MAX_REPORTED_IDS],
+            'mismatched': mismatched[:MAX_REPORTED_IDS],
+            'differences': len(missing) + len(extra) + len(mismatched),
+            'orders_ok': orders_ok,
+            'ok': orders_ok and not (current and (missing or extra or mismatched)),
+        }
+
+def check_product_index(index):
+    """Read the product table and compare it with index (see ProductIndex.check)."""
+    table_version = read_session.execute(CATALOG_VERSION_QUERY).scalar()
+    rows = read_session.execute(PRODUCT_INDEX_QUERY).all()
+    # A write between the two reads shows up as differences at a version
+    # that looks current; read the version again to tell.
+    if read_session.execute(CATALOG_VERSION_QUERY).scalar() != table_version:
+        table_version = None
+    return index.check(table_version, rows)
+
+product_index = ProductIndex()
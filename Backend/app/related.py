@@ -0,0 +1,175 @@
+# backend/app/related.py
+# "Frequently bought together": for every pair of products, how many carts
+# hold both. Triggers on cart_item keep product_pair current on every write
+# path (cart views, the write-behind cart store, checkout, raw SQL), so the
+# related products endpoint reads the top K pairs off an index and never
+# looks at cart_item.
+#
+# Carts with more than RELATED_MAX_CART_LINES lines are left out: they say
+# little about what goes together, and each cart write costs a statement per
+# line already in the cart. When a cart grows past the limit the pairs it
+# contributed are taken back, and they are added again if it shrinks to it.
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+from app import db
+from app.models import Product, ProductPair
+
+logger = logging.getLogger(__name__)
+
+RELATED_MAX_CART_LINES = 20
+
+# The other products in the cart of the row being written, if the cart's
+# size (after the write) passes the test. The CROSS JOIN makes SQLite look
+# at cart_size first, so a cart that fails the test is never scanned.
+_LINES_IF = ('(SELECT line.product_id FROM cart_size AS size CROSS JOIN cart_item AS line'
+             ' WHERE size.user_id = {row}.user_id AND size.lines {test}'
+             ' AND line.user_id = size.user_id AND line.product_id != {row}.product_id)')
+
+RELATED_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS cart_pairs_ai AFTER INSERT ON cart_item BEGIN
+        INSERT INTO cart_size (user_id, lines) VALUES (new.user_id, 1)
+            ON CONFLICT (user_id) DO UPDATE SET lines = lines + 1;
+        -- Still small enough: pair the new line with each of the others.
+        INSERT INTO product_pair (product_id, other_id, count)
+            SELECT new.product_id, product_id, 1 FROM %(new_small)s WHERE true
+            ON CONFLICT (product_id, other_id) DO UPDATE SET count = count + 1;
+        INSERT INTO product_pair (product_id, other_id, count)
+            SELECT product_id, new.product_id, 1 FROM %(new_small)s WHERE true
+            ON CONFLICT (product_id, other_id) DO UPDATE SET count = count + 1;
+        -- Just outgrew the limit: take back the pairs among the others.
+        UPDATE product_pair SET count = count - 1
+            WHERE product_id IN %(new_outgrown)s AND other_id IN %(new_outgrown)s;
+        DELETE FROM product_pair
+            WHERE product_id IN %(new_outgrown)s AND count <= 0;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cart_pairs_ad AFTER DELETE ON cart_item BEGIN
+        UPDATE cart_size SET lines = lines - 1 WHERE user_id = old.user_id;
+        -- Was small enough: unpair the removed line.
+        UPDATE product_pair SET count = count - 1
+            WHERE product_id = old.product_id AND other_id IN %(old_small)s;
+        UPDATE product_pair SET count = count - 1
+            WHERE product_id IN %(old_small)s AND other_id = old.product_id;
+        DELETE FROM product_pair
+            WHERE product_id = old.product_id AND count <= 0;
+        DELETE FROM product_pair
+            WHERE product_id IN %(old_small)s AND other_id = old.product_id AND count <= 0;
+        -- Shrunk back to the limit: pair up everything left.
+        INSERT INTO product_pair (product_id, other_id, count)
+            SELECT line.product_id, other.product_id, 1
+            FROM cart_size AS size CROSS JOIN cart_item AS line CROSS JOIN cart_item AS other
+            WHERE size.user_id = old.user_id AND size.lines = %(limit)d
+              AND line.user_id = old.user_id AND other.user_id = old.user_id
+              AND line.product_id != other.product_id
+            ON CONFLICT (product_id, other_id) DO UPDATE SET count = count + 1;
+        DELETE FROM cart_size WHERE user_id = old.user_id AND lines <= 0;
+    END""",
+)
+
+REBUILD_STATEMENTS = (
+    'DELETE FROM product_pair',
+    'DELETE FROM cart_size',
+    'INSERT INTO cart_size (user_id, lines) SELECT user_id, COUNT(*) FROM cart_item GROUP BY user_id',
+    """INSERT INTO product_pair (product_id, other_id, count)
+        SELECT a.product_id, b.product_id, COUNT(*) FROM cart_size AS s, cart_item AS a, cart_item AS b
+        WHERE s.lines <= %(limit)d AND a.user_id = s.user_id AND b.user_id = s.user_id
+          AND a.product_id != b.product_id
+        GROUP BY a.product_id, b.product_id""",
+)
+
+def create_related_triggers():
+    """Create the triggers; return True if they didn't exist yet."""
+    exists = db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'cart_pairs_ai'"
+    )).first()
+    limit = RELATED_MAX_CART_LINES
+    values = {
+        'limit': limit,
+        'new_small': _LINES_IF.format(row='new', test='<= %d' % limit),
+        'new_outgrown': _LINES_IF.format(row='new', test='= %d' % (limit + 1)),
+        'old_small': _LINES_IF.format(row='old', test='< %d' % limit),
+    }
+    for statement in RELATED_TRIGGERS:
+        db.session.execute(text(statement % values))
+    db.session.commit()
+    return not exists
+
+def rebuild_related():
+    """Recount product_pair and cart_size from cart_item; return the number of pairs.
+
+    One transaction, so the triggers never see half-built tables, but it
+    holds the write lock for as long as it runs.
+    """
+    try:
+        for statement in REBUILD_STATEMENTS:
+            db.session.execute(text(statement % {'limit': RELATED_MAX_CART_LINES}))
+        pairs = db.session.query(db.func.count()).select_from(ProductPair).scalar()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return pairs
+
+def related_products(session, product_id, limit):
+    """The products most often in a cart with product_id, or None if it doesn't exist."""
+    rows = session.query(
+        Product.id, Product.name, Product.price, Product.image, ProductPair.count
+    ).join(Product, Product.id == ProductPair.other_id).filter(
+        ProductPair.product_id == product_id,
+        ProductPair.count > 0
+    ).order_by(ProductPair.count.desc(), ProductPair.other_id.desc()).limit(limit).all()
+    if not rows and session.query(Product.id).filter(Product.id == product_id).first() is None:
+        return None
+    return [{
+        'id': row.id,
+        'name': row.name,
+        'price': row.price,
+        'image': row.image,
+        'carts': row.count
+    } for row in rows]
+
+class RelatedRebuilder:
+    """Runs rebuild_related() on a background thread, one rebuild at a time."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Start over with a fresh executor; a forked child inherits no thread."""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='related-rebuild')
+        self._lock = threading.Lock()
+        self._running = False
+        self._last = None
+
+    def start(self, app):
+        """Queue a rebuild; return False if one is already running."""
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+        self._executor.submit(self._run, app)
+        return True
+
+    def _run(self, app):
+        started = time.time()
+        result = {'started_at': started}
+        try:
+            with app.app_context():
+                result['pairs'] = rebuild_related()
+        except Exception as e:
+            logger.exception('Related products rebuild failed')
+            result['error'] = str(e)
+        result['seconds'] = round(time.time() - started, 3)
+        with self._lock:
+            self._running = False
+            self._last = result
+
+    def status(self):
+        with self._lock:
+            return {'running': self._running, 'last': self._last}
+
+related_rebuilder = RelatedRebuilder()
@@ -0,0 +1,53 @@
+# backend/app/routes/admin.py
+from flask import Blueprint, current_app, jsonify
+
+from app.auth import admin_required, auth_cache
+from app.maintenance import JOBS, job_status, maintenance
+from app.productindex import check_product_index, product_index
+from app.related import related_rebuilder
+
+admin = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+@admin.route('/auth-cache', methods=['GET'])
+@admin_required
+def auth_cache_stats(current_user):
+    return jsonify(auth_cache.stats())
+
+@admin.route('/related', methods=['GET'])
+@admin_required
+def related_index_status(current_user):
+    return jsonify(related_rebuilder.status())
+
+@admin.route('/related/rebuild', methods=['POST'])
+@admin_required
+def rebuild_related_index(current_user):
+    if not related_rebuilder.start(current_app._get_current_object()):
+        return jsonify({'message': 'A rebuild is already running'}), 409
+    return jsonify(related_rebuilder.status()), 202
+
+@admin.route('/maintenance', methods=['GET'])
+@admin_required
+def maintenance_status(current_user):
+    return jsonify({'jobs': job_status()})
+
+@admin.route('/maintenance/<job>', methods=['POST'])
+@admin_required
+def run_maintenance_job(current_user, job):
+    if job not in JOBS:
+        return jsonify({'message': 'Unknown job'}), 404
+    if not maintenance.run_now(current_app._get_current_object(), job):
+        return jsonify({'message': 'The job is already running'}), 409
+    return jsonify({'jobs': job_status()}), 202
+
+@admin.route('/product-index', methods=['GET'])
+@admin_required
+def product_index_status(current_user):
+    return jsonify(product_index.status())
+
+@admin.route('/product-index/check', methods=['POST'])
+@admin_required
+def check_product_index_route(current_user):
+    report = check_product_index(product_index)
+    if report is None:
+        return jsonify({'message': 'The product index is not loaded'}), 409
+    return jsonify(report)
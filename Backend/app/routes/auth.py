@@ -0,0 +1,81 @@
+# backend/app/routes/auth.py
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+
+import jwt
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import User
+from app.passwords import HashPoolSaturated, busy_response, hash_pool, verify_password
+
+auth = Blueprint('auth', __name__, url_prefix='/api/auth')
+
+@auth.route('/register', methods=['POST'])
+def register():
+    data = request.get_json()
+    
+    if not all(k in data for k in ('name', 'email', 'password')):
+        return jsonify({'message': 'Missing required fields'}), 400
+    
+    if User.query.filter_by(email=data['email']).first():
+        return jsonify({'message': 'Email already registered'}), 400
+    
+    try:
+        hashed_password = hash_pool.run(
+            generate_password_hash, data['password'], current_app.config['PASSWORD_HASH_METHOD'],
+            timeout=current_app.config['HASH_TIMEOUT'])
+    except (HashPoolSaturated, FutureTimeout):
+        return busy_response()
+    
+    new_user = User(
+        name=data['name'],
+        email=data['email'],
+        password=hashed_password,
+        is_admin=data.get('isAdmin', False)
+    )
+    
+    db.session.add(new_user)
+    db.session.commit()
+    
+    return jsonify({'message': 'User created successfully'}), 201
+
+@auth.route('/login', methods=['POST'])
+def login():
+    data = request.get_json()
+    
+    if not all(k in data for k in ('email', 'password')):
+        return jsonify({'message': 'Missing required fields'}), 400
+    
+    user = User.query.filter_by(email=data['email']).first()
+    
+    if not user:
+        return jsonify({'message': 'Invalid credentials'}), 401
+    
+    try:
+        valid, upgraded_hash = hash_pool.run(
+            verify_password, user.password, data['password'], current_app.config['PASSWORD_HASH_METHOD'],
+            timeout=current_app.config['HASH_TIMEOUT'])
+    except (HashPoolSaturated, FutureTimeout):
+        return busy_response()
+    if not valid:
+        return jsonify({'message': 'Invalid credentials'}), 401
+    if upgraded_hash:
+        user.password = upgraded_hash
+        db.session.commit()
+    
+    token = jwt.encode({
+        'user_id': user.id,
+        'exp': datetime.utcnow() + timedelta(days=1)
+    }, current_app.config['SECRET_KEY'])
+    
+    return jsonify({
+        'token': token,
+        'user': {
+            'id': user.id,
+            'name': user.name,
+            'email': user.email,
+            'isAdmin': user.is_admin
+        }
+    })
@@ -0,0 +1,96 @@
+# backend/app/routes/cart.py
+from flask import Blueprint, abort, jsonify, request
+
+from app.auth import token_required
+from app.cartstore import get_cart_store
+
+cart = Blueprint('cart', __name__, url_prefix='/api/cart')
+
+@cart.route('', methods=['GET'])
+@token_required
+def get_cart(current_user):
+    return get_cart_store().response(current_user.id)
+
+@cart.route('', methods=['POST'])
+@token_required
+def add_to_cart(current_user):
+    data = request.get_json()
+    
+    if 'product_id' not in data:
+        return jsonify({'message': 'Product ID is required'}), 400
+    
+    try:
+        line = get_cart_store().add(current_user.id, int(data['product_id']), 1)
+        return jsonify(line), 201
+    except Exception as e:
+        return jsonify({'message': str(e)}), 400
+
+MAX_CART_BATCH = 100
+CART_BATCH_OPS = ('add', 'set', 'remove')
+
+@cart.route('/batch', methods=['POST'])
+@token_required
+def batch_update_cart(current_user):
+    data = request.get_json()
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'message': 'Operations are required'}), 400
+    if len(operations) > MAX_CART_BATCH:
+        return jsonify({'message': 'At most %d operations per batch' % MAX_CART_BATCH}), 400
+
+    # Validate everything up front so a bad entry never leaves half a batch applied.
+    parsed = []
+    for position, operation in enumerate(operations):
+        try:
+            op = operation['op']
+            product_id = int(operation['product_id'])
+            quantity = int(operation.get('quantity', 1))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'message': 'Invalid operation', 'index': position}), 400
+        if op not in CART_BATCH_OPS or (op == 'add' and quantity < 1):
+            return jsonify({'message': 'Invalid operation', 'index': position}), 400
+        parsed.append((op, product_id, quantity))
+
+    store = get_cart_store()
+    try:
+        store.apply(current_user.id, parsed)
+    except Exception as e:
+        return jsonify({'message': str(e)}), 400
+
+    return store.response(current_user.id)
+
+@cart.route('/<int:product_id>', methods=['PUT'])
+@token_required
+def update_cart_quantity(current_user, product_id):
+    data = request.get_json()
+    if 'quantity' not in data:
+        return jsonify({'message': 'Quantity is required'}), 400
+    try:
+        quantity = int(data['quantity'])
+    except (TypeError, ValueError):
+        return jsonify({'message': 'Quantity must be a number'}), 400
+
+    store = get_cart_store()
+    try:
+        if quantity > 0:
+            line = store.update(current_user.id, product_id, quantity)
+        else:
+            line = store.remove(current_user.id, product_id)
+    except Exception as e:
+        return jsonify({'message': str(e)}), 400
+    if not line:
+        abort(404)
+    if quantity > 0:
+        return jsonify(line)
+    return '', 204
+
+@cart.route('/<int:product_id>', methods=['DELETE'])
+@token_required
+def remove_from_cart(current_user, product_id):
+    try:
+        removed = get_cart_store().remove(current_user.id, product_id)
+    except Exception as e:
+        return jsonify({'message': str(e)}), 400
+    if not removed:
+        abort(404)
+    return '', 204
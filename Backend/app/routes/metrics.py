@@ -0,0 +1,15 @@
+# backend/app/routes/metrics.py
+import hmac
+
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from app.metrics import metrics
+
+monitoring = Blueprint('monitoring', __name__)
+
+@monitoring.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token):
+        return jsonify({'message': 'Token is invalid'}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
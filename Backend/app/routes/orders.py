@@ -0,0 +1,27 @@
+# backend/app/routes/orders.py
+from flask import Blueprint, jsonify, request
+
+from app.auth import token_required
+from app.orders import CheckoutError, place_order, user_orders
+
+orders = Blueprint('orders', __name__, url_prefix='/api')
+
+MAX_ORDERS_PAGE = 100
+
+@orders.route('/checkout', methods=['POST'])
+@token_required
+def checkout(current_user):
+    try:
+        order = place_order(current_user.id)
+    except CheckoutError as e:
+        body = {'message': str(e)}
+        if e.product_id is not None:
+            body['product_id'] = e.product_id
+        return jsonify(body), e.status
+    return jsonify(order), 201
+
+@orders.route('/orders', methods=['GET'])
+@token_required
+def list_orders(current_user):
+    limit = max(1, min(request.args.get('limit', 20, type=int), MAX_ORDERS_PAGE))
+    return jsonify(user_orders(current_user.id, limit))
@@ -0,0 +1,234 @@
+# backend/app/routes/products.py
+import csv
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from sqlalchemy import text
+
+from app import db, read_session
+from app.bulk import bulk_update_products, export_products, import_products
+from app.catalog import (
+    DEFAULT_PAGE_SIZE, bump_catalog_version, catalog_cache, fts_query, product_list_params,
+    product_page_payload, product_page_statement, snapshot_response,
+)
+from app.auth import admin_required, token_required
+from app.models import Product
+from app.facets import price_facets
+from app.related import related_products
+from app.jsonstream import iter_json_array, json_stream_response
+from app.productindex import product_index
+from app.uploads import thumbnails_for_image
+
+products = Blueprint('products', __name__, url_prefix='/api/products')
+
+@products.route('', methods=['GET'])
+@token_required
+def get_products(current_user):
+    try:
+        params = product_list_params(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    version = catalog_cache.current_version()
+    page_key = tuple(params.values())
+    snapshot = catalog_cache.get(version, page_key)
+    if snapshot is not None:
+        return snapshot_response(snapshot)
+
+    try:
+        products = product_index.page(version, **params)
+        statement = product_page_statement(**params) if products is None else None
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if products is None:
+        product_index.refresh(version)
+        products = read_session.execute(statement).all()
+
+    snapshot = catalog_cache.put(version, page_key, product_page_payload(
+        products, params['sort'], params['limit']))
+    return snapshot_response(snapshot)
+
+@products.route('/facets', methods=['GET'])
+@token_required
+def get_product_facets(current_user):
+    return jsonify(price_facets(read_session))
+
+MAX_SEARCH_RESULTS = 50
+MAX_SUGGESTIONS = 10
+MAX_RELATED = 20
+
+@products.route('/<int:product_id>/related', methods=['GET'])
+@token_required
+def get_related_products(current_user, product_id):
+    limit = max(1, min(request.args.get('limit', 8, type=int), MAX_RELATED))
+    related = related_products(read_session, product_id, limit)
+    if related is None:
+        return jsonify({'message': 'Product not found'}), 404
+    return jsonify(related)
+
+@products.route('/search', methods=['GET'])
+@token_required
+def search_products(current_user):
+    match = fts_query(request.args.get('q', ''))
+    if not match:
+        return jsonify({'message': 'Query is required'}), 400
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_SEARCH_RESULTS))
+
+    rows = read_session.execute(text(
+        "SELECT product.id, product.name, product.price, product.image "
+        "FROM product_fts JOIN product ON product.id = product_fts.rowid "
+        "WHERE product_fts MATCH :match ORDER BY product_fts.rank LIMIT :limit"
+    ), {'match': match, 'limit': limit})
+    return json_stream_response(iter_json_array({
+        'id': row.id,
+        'name': row.name,
+        'price': row.price,
+        'image': row.image
+    } for row in rows))
+
+@products.route('/suggest', methods=['GET'])
+@token_required
+def suggest_products(current_user):
+    match = fts_query(request.args.get('q', ''), prefix_last=True)
+    if not match:
+        return jsonify([])
+    limit = max(1, min(request.args.get('limit', 8, type=int), MAX_SUGGESTIONS))
+
+    # Names come straight from the external-content table, and the results
+    # are not ranked: bm25 would have to score every match of a short prefix
+    # like "ch", while the first few hits are all the search box needs.
+    rows = read_session.execute(text(
+        "SELECT rowid AS id, name FROM product_fts "
+        "WHERE product_fts MATCH :match LIMIT :limit"
+    ), {'match': match, 'limit': limit})
+    return json_stream_response(iter_json_array(
+        {'id': row.id, 'name': row.name} for row in rows))
+
+def parse_stock(value):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError('Stock must be a non-negative integer or null')
+    return value
+
+@products.route('', methods=['POST'])
+@admin_required
+def add_product(current_user):
+    data = request.get_json()
+    
+    if not all(k in data for k in ('name', 'price')):
+        return jsonify({'message': 'Missing required fields'}), 400
+    
+    try:
+        product = Product(
+            name=data['name'],
+            price=float(data['price']),
+            image=data.get('image', ''),
+            stock=parse_stock(data.get('stock'))
+        )
+        product.thumbnails = thumbnails_for_image(product.image)
+        db.session.add(product)
+        version = bump_catalog_version()
+        db.session.commit()
+        catalog_cache.invalidate()
+        product_index.apply(version, product)
+        
+        return jsonify({
+            'id': product.id,
+            'name': product.name,
+            'price': product.price,
+            'image': product.image,
+            'stock': product.stock
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+
+@products.route('/<int:product_id>', methods=['PUT'])
+@admin_required
+def update_product(current_user, product_id):
+    product = Product.query.get_or_404(product_id)
+    data = request.get_json()
+    
+    try:
+        if 'name' in data:
+            product.name = data['name']
+        if 'price' in data:
+            product.price = float(data['price'])
+        if 'image' in data:
+            product.image = data['image']
+            product.thumbnails = thumbnails_for_image(product.image)
+        if 'stock' in data:
+            product.stock = parse_stock(data['stock'])
+        
+        version = bump_catalog_version()
+        db.session.commit()
+        catalog_cache.invalidate()
+        product_index.apply(version, product)
+        return jsonify({
+            'id': product.id,
+            'name': product.name,
+            'price': product.price,
+            'image': product.image,
+            'stock': product.stock
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+
+@products.route('/<int:product_id>', methods=['DELETE'])
+@admin_required
+def delete_product(current_user, product_id):
+    product = Product.query.get_or_404(product_id)
+    try:
+        db.session.delete(product)
+        version = bump_catalog_version()
+        db.session.commit()
+        catalog_cache.invalidate()
+        product_index.apply(version, deleted_id=product_id)
+        return '', 204
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+
+@products.route('/bulk-update', methods=['POST'])
+@admin_required
+def bulk_update_products_route(current_user):
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'message': 'Expected a JSON object'}), 400
+    try:
+        report = bulk_update_products(data.get('filter'), data.get('update'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(report)
+
+def bulk_format():
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    return fmt if fmt in ('ndjson', 'csv') else None
+
+@products.route('/import', methods=['POST'])
+@admin_required
+def import_products_route(current_user):
+    fmt = bulk_format()
+    if fmt is None:
+        return jsonify({'message': 'Format must be ndjson or csv'}), 400
+    # Read the body as it arrives instead of letting Werkzeug buffer it.
+    lines = (line.decode('utf-8') for line in request.stream)
+    try:
+        report = import_products(lines, fmt)
+    except (UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(report)
+
+@products.route('/export', methods=['GET'])
+@admin_required
+def export_products_route(current_user):
+    fmt = bulk_format()
+    if fmt is None:
+        return jsonify({'message': 'Format must be ndjson or csv'}), 400
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(export_products(fmt)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = 'attachment; filename=products.%s' % fmt
+    return response
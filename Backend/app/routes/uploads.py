@@ -0,0 +1,160 @@
+# backend/app/routes/uploads.py
+import os
+import secrets
+
+from flask import Blueprint, abort, current_app, jsonify, request, send_file
+from werkzeug.security import safe_join
+
+from app.auth import admin_required
+from app.media import media_cache_control, media_etag, media_headers, media_type, offload_header
+from app.models import UploadSession
+from app.uploads import (
+    ChecksumMismatch, ChunkOffsetMismatch, ChunkTooLarge, allowed_file, cancel_chunked_upload,
+    finish_chunked_upload, media_payload, register_media, save_upload, start_chunked_upload,
+    write_chunk,
+)
+
+uploads = Blueprint('uploads', __name__)
+
+@uploads.route('/api/upload', methods=['POST'])
+@admin_required
+def upload_file(current_user):
+    if 'file' not in request.files:
+        return jsonify({'message': 'No file part'}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'message': 'No selected file'}), 400
+    if not allowed_file(file.filename):
+        return jsonify({'message': 'File type not allowed'}), 400
+
+    digest, filename = save_upload(file)
+    return jsonify(media_payload(register_media(digest, filename))), 200
+
+# Chunked uploads: POST /api/uploads to start, PUT each chunk at its offset,
+# GET to find where to resume, POST .../complete with the file's SHA-256.
+
+def upload_state(session):
+    return {
+        'id': session.id,
+        'size': session.size,
+        'offset': session.received
+    }
+
+def own_upload(current_user, upload_id):
+    session = UploadSession.query.get(upload_id)
+    if session is None or session.user_id != current_user.id:
+        return None
+    return session
+
+@uploads.route('/api/uploads', methods=['POST'])
+@admin_required
+def start_upload(current_user):
+    data = request.get_json()
+    filename = data.get('filename', '') if isinstance(data, dict) else ''
+    if not allowed_file(filename):
+        return jsonify({'message': 'File type not allowed'}), 400
+    try:
+        size = int(data['size'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'message': 'Size is required'}), 400
+    if size <= 0:
+        return jsonify({'message': 'Size must be positive'}), 400
+    if size > current_app.config['UPLOAD_MAX_SIZE']:
+        return jsonify({'message': 'File is too large'}), 413
+
+    session = start_chunked_upload(current_user.id, secrets.token_hex(16),
+                                   filename.rsplit('.', 1)[1].lower(), size)
+    return jsonify(upload_state(session)), 201
+
+@uploads.route('/api/uploads/<upload_id>', methods=['GET'])
+@admin_required
+def get_upload(current_user, upload_id):
+    session = own_upload(current_user, upload_id)
+    if session is None:
+        return jsonify({'message': 'Upload not found'}), 404
+    return jsonify(upload_state(session))
+
+@uploads.route('/api/uploads/<upload_id>', methods=['PUT'])
+@admin_required
+def put_chunk(current_user, upload_id):
+    session = own_upload(current_user, upload_id)
+    if session is None:
+        return jsonify({'message': 'Upload not found'}), 404
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'message': 'Offset is required'}), 400
+    if request.content_length is not None and offset + request.content_length > session.size:
+        return jsonify({'message': 'Chunk runs past the declared size'}), 413
+
+    try:
+        write_chunk(session, offset, request.stream)
+    except ChunkOffsetMismatch:
+        # Most likely a retry of a chunk that did arrive; carry on from here.
+        session = UploadSession.query.get(upload_id)
+        if session is None:
+            return jsonify({'message': 'Upload not found'}), 404
+        return jsonify(dict(upload_state(session), message='Offset does not match')), 409
+    except ChunkTooLarge:
+        return jsonify({'message': 'Chunk runs past the declared size'}), 413
+    return jsonify(upload_state(UploadSession.query.get(upload_id)))
+
+@uploads.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+@admin_required
+def complete_upload(current_user, upload_id):
+    session = own_upload(current_user, upload_id)
+    if session is None:
+        return jsonify({'message': 'Upload not found'}), 404
+    data = request.get_json()
+    sha256 = data.get('sha256') if isinstance(data, dict) else None
+    if not isinstance(sha256, str):
+        return jsonify({'message': 'sha256 is required'}), 400
+    if session.received != session.size:
+        return jsonify(dict(upload_state(session), message='Upload is incomplete')), 409
+
+    try:
+        stored = finish_chunked_upload(session, sha256)
+    except ChecksumMismatch:
+        return jsonify({'message': 'Checksum mismatch; the upload was discarded'}), 400
+    if stored is None:
+        return jsonify({'message': 'Upload not found'}), 404
+    digest, filename = stored
+    return jsonify(media_payload(register_media(digest, filename))), 200
+
+@uploads.route('/api/uploads/<upload_id>', methods=['DELETE'])
+@admin_required
+def cancel_upload(current_user, upload_id):
+    session = own_upload(current_user, upload_id)
+    if session is None:
+        return jsonify({'message': 'Upload not found'}), 404
+    cancel_chunked_upload(session)
+    return '', 204
+
+@uploads.route('/uploads/<filename>')
+def uploaded_file(filename):
+    config = current_app.config
+    path = safe_join(config['UPLOAD_FOLDER'], filename)
+    if path is None or filename.startswith('.'):
+        abort(404)
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        abort(404)
+
+    offload = offload_header(config['MEDIA_OFFLOAD'], config['MEDIA_ACCEL_LOCATION'],
+                             config['UPLOAD_FOLDER'], filename)
+    if offload is not None:
+        # The front-end server sends the bytes (and answers Range requests);
+        # we only decide the headers and whether the client's copy is current.
+        response = current_app.response_class(mimetype=media_type(filename))
+        response.headers.update(media_headers(filename, stat_result, config['MEDIA_MAX_AGE']))
+        response.headers[offload[0]] = offload[1]
+        return response.make_conditional(request)
+
+    # Range, If-Range and 304s are handled by send_file; under gunicorn the
+    # body goes out through wsgi.file_wrapper, i.e. sendfile(2).
+    response = send_file(path, etag=media_etag(filename, stat_result),
+                         last_modified=stat_result.st_mtime, conditional=True)
+    response.headers['Cache-Control'] = media_cache_control(filename, config['MEDIA_MAX_AGE'])
+    # send_file only says so on 206s; the offload branch gets it from media_headers().
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
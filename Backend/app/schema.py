@@ -0,0 +1,127 @@
+# backend/app/schema.py
+# Creating and upgrading the database. Nothing here runs at import time:
+# `flask init-db` (or `python run.py` in development) calls init_db().
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import inspect, text
+
+from app import db
+from app.auth import create_auth_triggers
+from app.catalog import bump_catalog_version
+from app.facets import create_facet_triggers, facets_match, rebuild_facets
+from app.models import Product, CatalogMeta, CartItem, ProductPair
+from app.related import create_related_triggers, rebuild_related
+
+# Full-text search over product names. product_fts is an external-content
+# FTS5 table: it stores only the index and reads names back from product,
+# and the triggers keep it in step with every insert, update and delete.
+PRODUCT_FTS_DDL = (
+    """CREATE VIRTUAL TABLE product_fts USING fts5(
+        name, content='product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO product_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+)
+
+# Keyset paging steps past a page's last (created_at, id), and a NULL date
+# compares as neither before nor after it, so every product has a date:
+# rows inserted without one (raw SQL) get the insert time, as the model's
+# default would have given them.
+PRODUCT_CREATED_AT_TRIGGER = """CREATE TRIGGER IF NOT EXISTS product_created_at_ai AFTER INSERT ON product
+    WHEN new.created_at IS NULL BEGIN
+        UPDATE product SET created_at = strftime('%Y-%m-%d %H:%M:%f000', 'now') WHERE id = new.id;
+    END"""
+
+def date_undated_products():
+    """Give products stored without a created_at the oldest date in the catalog.
+
+    They sorted first in `oldest` order before (SQLite puts NULL first), and
+    still do, but now a cursor can point at them.
+    """
+    undated = Product.query.filter(Product.created_at.is_(None))
+    if undated.first() is None:
+        return 0
+    oldest = db.session.query(db.func.min(Product.created_at)).scalar() or datetime.utcnow()
+    count = undated.update({Product.created_at: oldest}, synchronize_session=False)
+    bump_catalog_version()
+    db.session.commit()
+    return count
+
+def create_search_index():
+    exists = db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_fts'"
+    )).first()
+    if exists:
+        return
+    for statement in PRODUCT_FTS_DDL:
+        db.session.execute(text(statement))
+    # Index the products that were there before the table existed.
+    db.session.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+    db.session.commit()
+
+def merge_duplicate_cart_items():
+    """Fold duplicate (user, product) cart rows into the oldest one.
+
+    Needed once on databases created before the unique index existed.
+    """
+    existing = {index['name'] for index in inspect(db.engine).get_indexes('cart_item')}
+    if 'uq_cart_item_user_product' in existing:
+        return
+    db.session.execute(text(
+        "UPDATE cart_item SET quantity = ("
+        "  SELECT SUM(dup.quantity) FROM cart_item AS dup"
+        "  WHERE dup.user_id = cart_item.user_id AND dup.product_id = cart_item.product_id)"
+        " WHERE id IN (SELECT MIN(id) FROM cart_item GROUP BY user_id, product_id"
+        "  HAVING COUNT(*) > 1)"
+    ))
+    db.session.execute(text(
+        "DELETE FROM cart_item WHERE id NOT IN ("
+        "  SELECT MIN(id) FROM cart_item GROUP BY user_id, product_id)"
+    ))
+    db.session.commit()
+
+def add_missing_columns(*models):
+    """ALTER TABLE in columns added to a model after its table was created."""
+    inspector = inspect(db.engine)
+    for model in models:
+        table = model.__table__
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                db.session.execute(text('ALTER TABLE %s ADD COLUMN %s %s' % (
+                    table.name, column.name, column.type.compile(db.engine.dialect))))
+    db.session.commit()
+
+def init_db():
+    """Create missing tables, columns, indexes and triggers. Safe to re-run."""
+    db.create_all()
+    add_missing_columns(Product)
+    merge_duplicate_cart_items()
+    # create_all skips tables that already exist, so indexes added to an
+    # existing model have to be created explicitly.
+    for index in Product.__table__.indexes | CartItem.__table__.indexes | ProductPair.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    if CatalogMeta.query.get(1) is None:
+        db.session.add(CatalogMeta(id=1, version=0))
+        db.session.commit()
+    db.session.execute(text(PRODUCT_CREATED_AT_TRIGGER))
+    db.session.commit()
+    date_undated_products()
+    create_search_index()
+    create_auth_triggers()
+    create_facet_triggers()
+    # Also rebuilds after PRICE_FACET_BOUNDS changes.
+    if not facets_match(current_app.config['PRICE_FACET_BOUNDS']):
+        rebuild_facets(current_app.config['PRICE_FACET_BOUNDS'])
+    # Pair up the carts that were there before the triggers.
+    if create_related_triggers():
+        rebuild_related()
@@ -0,0 +1,280 @@
+# backend/app/uploads.py
+# Upload pipeline: uploads are stored under their content hash and the WebP
+# derivatives of images are generated in a process pool. Large files can be
+# sent in resumable chunks instead of one multipart body.
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+import shutil
+import threading
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import ClientDisconnected
+
+from app import db
+from app.catalog import bump_catalog_version, catalog_cache
+from app.imaging import make_derivatives
+from app.media import is_content_addressed
+from app.models import MediaAsset, Product, UploadSession
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+VIDEO_EXTENSIONS = {'mp4', 'webm', 'mov'}
+ALLOWED_EXTENSIONS = IMAGE_EXTENSIONS | VIDEO_EXTENSIONS
+COPY_BUFFER_SIZE = 64 * 1024
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+_image_pool = None
+_image_pool_lock = threading.Lock()
+
+def get_image_pool():
+    # Created on first use so neither importing nor building the app forks
+    # worker processes.
+    global _image_pool
+    with _image_pool_lock:
+        if _image_pool is None:
+            _image_pool = ProcessPoolExecutor(max_workers=current_app.config['IMAGE_WORKERS'])
+        return _image_pool
+
+def reset_image_pool():
+    """Forget a pool inherited through fork(); its processes belong to the parent."""
+    global _image_pool, _image_pool_lock
+    _image_pool = None
+    _image_pool_lock = threading.Lock()
+
+def save_upload(file):
+    """Stream an upload to disk under its content hash; return (digest, filename)."""
+    folder = current_app.config['UPLOAD_FOLDER']
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    sha = hashlib.sha256()
+    partial = os.path.join(folder, '.upload-%d-%d' % (os.getpid(), threading.get_ident()))
+    with open(partial, 'wb') as out:
+        for chunk in iter(lambda: file.stream.read(COPY_BUFFER_SIZE), b''):
+            sha.update(chunk)
+            out.write(chunk)
+    digest = sha.hexdigest()
+    return digest, store_upload(partial, digest, extension)
+
+def store_upload(partial, digest, extension):
+    """Move a finished upload to its content-addressed name; return that name."""
+    folder = current_app.config['UPLOAD_FOLDER']
+    filename = '%s.%s' % (digest[:32], extension)
+    path = os.path.join(folder, filename)
+    if os.path.exists(path):
+        os.remove(partial)
+    else:
+        os.replace(partial, path)
+    return filename
+
+def register_media(digest, filename):
+    """The MediaAsset for a stored upload, created (and its derivatives queued) if new."""
+    asset = MediaAsset.query.filter_by(digest=digest).first()
+    if asset is not None:
+        return asset
+    is_image = filename.rsplit('.', 1)[1] in IMAGE_EXTENSIONS
+    # Videos are served as uploaded; there is nothing to resize.
+    asset = MediaAsset(digest=digest, filename=filename,
+                       status='pending' if is_image else 'ready',
+                       derivatives=None if is_image else {})
+    db.session.add(asset)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Someone uploaded the same file at the same moment; use theirs.
+        db.session.rollback()
+        return MediaAsset.query.filter_by(digest=digest).one()
+    if is_image:
+        # Resizing happens in another process; the request returns now.
+        folder = current_app.config['UPLOAD_FOLDER']
+        future = get_image_pool().submit(
+            make_derivatives,
+            os.path.join(folder, filename),
+            folder,
+            digest[:32],
+            current_app.config['THUMBNAIL_WIDTHS']
+        )
+        app = current_app._get_current_object()
+        asset_id = asset.id
+        future.add_done_callback(lambda done: record_derivatives(app, asset_id, done))
+    return asset
+
+def media_payload(asset):
+    return {
+        'filename': asset.filename,
+        'status': asset.status,
+        'thumbnails': {width: upload_url(name) for width, name in (asset.derivatives or {}).items()}
+    }
+
+def upload_url(filename):
+    return '/uploads/' + filename
+
+def thumbnails_for_image(image):
+    """Derivative URLs for a product image that points at one of our uploads."""
+    if not image:
+        return None
+    asset = MediaAsset.query.filter_by(filename=image.rsplit('/', 1)[-1], status='ready').first()
+    if asset is None:
+        return None
+    return {width: upload_url(name) for width, name in asset.derivatives.items()}
+
+def record_derivatives(app, asset_id, future):
+    """Done-callback for a derivative job; runs on the pool's result thread."""
+    with app.app_context():
+        asset = MediaAsset.query.get(asset_id)
+        try:
+            derivatives = future.result()
+        except Exception:
+            app.logger.exception('Generating derivatives for %s failed', asset.filename)
+            asset.status = 'failed'
+            db.session.commit()
+            return
+        asset.derivatives = {str(width): name for width, name in derivatives.items()}
+        asset.status = 'ready'
+        # Products may have been saved pointing at this image while it was processing.
+        thumbnails = {width: upload_url(name) for width, name in asset.derivatives.items()}
+        updated = Product.query.filter(db.or_(
+            Product.image == asset.filename,
+            Product.image.like('%/uploads/' + asset.filename)
+        )).update({Product.thumbnails: thumbnails}, synchronize_session=False)
+        if updated:
+            bump_catalog_version()
+        db.session.commit()
+        db.session.remove()
+        catalog_cache.invalidate()
+
+# Chunked uploads
+
+class ChunkOffsetMismatch(Exception):
+    pass
+
+class ChunkTooLarge(Exception):
+    pass
+
+class ChecksumMismatch(Exception):
+    pass
+
+def partial_path(upload_id):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], '.partial', upload_id)
+
+def start_chunked_upload(user_id, upload_id, extension, size):
+    os.makedirs(os.path.dirname(partial_path(upload_id)), exist_ok=True)
+    open(partial_path(upload_id), 'wb').close()
+    session = UploadSession(id=upload_id, user_id=user_id, extension=extension, size=size)
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+def write_chunk(session, offset, stream):
+    """Write a request body into an upload at offset; return the new offset.
+
+    The body is copied to disk COPY_BUFFER_SIZE bytes at a time, never held
+    whole. If the client goes away mid-chunk, what did arrive is kept and
+    the upload resumes from there.
+    """
+    if offset != session.received:
+        raise ChunkOffsetMismatch()
+    end = offset
+    with open(partial_path(session.id), 'r+b') as out:
+        out.seek(offset)
+        while True:
+            try:
+                # One byte more than fits, to notice a body that is too long.
+                block = stream.read(min(COPY_BUFFER_SIZE, session.size - end + 1))
+            except ClientDisconnected:
+                break
+            if not block:
+                break
+            if end + len(block) > session.size:
+                raise ChunkTooLarge()
+            out.write(block)
+            end += len(block)
+        out.flush()
+        os.fsync(out.fileno())
+    # Only advance if no other request moved the offset while we were writing.
+    advanced = UploadSession.query.filter_by(id=session.id, received=offset).update(
+        {UploadSession.received: end}, synchronize_session=False)
+    db.session.commit()
+    if not advanced:
+        raise ChunkOffsetMismatch()
+    return end
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def finish_chunked_upload(session, sha256):
+    """Check a fully received upload and store it; return (digest, filename).
+
+    Raises ChecksumMismatch (and drops the upload) if the content doesn't
+    hash to sha256. Returns None if another request finished or cancelled
+    it first.
+    """
+    upload_id, extension = session.id, session.extension
+    partial = partial_path(upload_id)
+    try:
+        digest = file_digest(partial)
+    except FileNotFoundError:
+        return None
+    if digest != sha256.lower():
+        cancel_chunked_upload(session)
+        raise ChecksumMismatch()
+    # Claim the session; a concurrent complete finds it gone.
+    claimed = UploadSession.query.filter_by(id=upload_id).delete(synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return None
+    return digest, store_upload(partial, digest, extension)
+
+def cancel_chunked_upload(session):
+    upload_id = session.id
+    UploadSession.query.filter_by(id=upload_id).delete(synchronize_session=False)
+    db.session.commit()
+    try:
+        os.remove(partial_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+def hash_legacy_uploads():
+    """Copy each upload whose name isn't its content hash to that name.
+
+    Products pointing at the old file are moved to the new URL, which can be
+    cached for good. The old file stays, so links to it keep working.
+    Return {old name: new name}.
+    """
+    folder = current_app.config['UPLOAD_FOLDER']
+    renamed = {}
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if name.startswith('.') or is_content_addressed(name) or not allowed_file(name) \
+                or not os.path.isfile(path):
+            continue
+        digest = file_digest(path)
+        partial = os.path.join(folder, '.rehash-%d' % os.getpid())
+        shutil.copyfile(path, partial)
+        filename = store_upload(partial, digest, name.rsplit('.', 1)[1].lower())
+        asset = register_media(digest, filename)
+        values = {Product.image: upload_url(filename)}
+        if asset.status == 'ready':
+            values[Product.thumbnails] = {width: upload_url(derivative)
+                                          for width, derivative in asset.derivatives.items()}
+        try:
+            # Pending derivatives reach these products through record_derivatives().
+            updated = Product.query.filter(db.or_(
+                Product.image == name,
+                Product.image.like('%/uploads/' + name)
+            )).update(values, synchronize_session=False)
+            if updated:
+                bump_catalog_version()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        renamed[name] = filename
+    if renamed:
+        catalog_cache.invalidate()
+    return renamed
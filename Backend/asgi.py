@@ -0,0 +1,6 @@
+# backend/asgi.py
+# Asyncio read server (see app/asgi.py):
+#   uvicorn asgi:app --workers 4 --timeout-keep-alive 75 --backlog 4096
+from app.asgi import create_asgi_app
+
+app = create_asgi_app()
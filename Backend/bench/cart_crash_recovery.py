@@ -0,0 +1,154 @@
+# backend/bench/cart_crash_recovery.py
+# Crash recovery for the cart backends. A client adds a new product to its
+# cart as fast as the server acknowledges, the server is killed with SIGKILL
+# part-way through, and a restarted server is asked for the cart. Every
+# acknowledged add is either in the recovered cart or lost; with the memory
+# backend the lost ones must all be younger than the flush interval (plus
+# the time a flush takes), with the sql backend none may be lost. Exits
+# non-zero if that doesn't hold.
+#
+#   python bench/cart_crash_recovery.py [--backends sql,memory] [--flush-interval 1.0]
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+SECRET_KEY = 'cart-crash-recovery-secret-key-not-for-production'
+PORT = 5079
+
+def token_for(user_id):
+    import jwt
+    return jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                      SECRET_KEY, algorithm='HS256')
+
+def setup(database, uploads, products):
+    import sqlite3
+    from app import create_app
+    from app.config import Config
+    from app.schema import init_db
+
+    class SetupConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + database
+        UPLOAD_FOLDER = uploads
+
+    with create_app(SetupConfig).app_context():
+        init_db()
+    connection = sqlite3.connect(database)
+    connection.execute("INSERT INTO user (id, name, email, password, is_admin) "
+                       "VALUES (1, 'crash', 'crash@bench.local', 'x', 0)")
+    connection.executemany('INSERT INTO product (name, price, image) VALUES (?, 1.0, ?)',
+                           (('product %d' % i, '') for i in range(products)))
+    connection.commit()
+    connection.close()
+
+def start_server(env):
+    server = subprocess.Popen([sys.executable, '-W', 'ignore', os.path.join(BACKEND_DIR, 'bench', 'server.py')],
+                              cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=1)
+            connection.request('GET', '/metrics')
+            connection.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise SystemExit('server did not start')
+
+def add_until_killed(headers, products, acknowledged):
+    """Add products 1, 2, ... one at a time; record when each add was acknowledged."""
+    connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=5)
+    for product_id in range(1, products + 1):
+        try:
+            connection.request('POST', '/api/cart', body=json.dumps({'product_id': product_id}),
+                               headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            # The server was killed mid-response.
+            return
+        if response.status == 201:
+            acknowledged[product_id] = time.monotonic()
+
+def run(backend, args, workdir):
+    database = os.path.join(workdir, '%s.db' % backend)
+    env = dict(os.environ,
+               DATABASE_URL='sqlite:///' + database,
+               SECRET_KEY=SECRET_KEY,
+               UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+               CART_BACKEND=backend,
+               CART_FLUSH_INTERVAL=str(args.flush_interval),
+               BIND='127.0.0.1:%d' % PORT)
+    setup(database, env['UPLOAD_FOLDER'], args.products)
+    headers = {'Authorization': 'Bearer ' + token_for(1), 'Content-Type': 'application/json'}
+
+    server = start_server(env)
+    acknowledged = {}
+    client = threading.Thread(target=add_until_killed, args=(headers, args.products, acknowledged))
+    client.start()
+    time.sleep(args.kill_after)
+    server.send_signal(signal.SIGKILL)
+    killed_at = time.monotonic()
+    server.wait()
+    client.join()
+
+    server = start_server(env)
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+        connection.request('GET', '/api/cart', headers=headers)
+        cart = json.loads(connection.getresponse().read())
+    finally:
+        server.terminate()
+        server.wait()
+
+    recovered = {item['product_id'] for item in cart['items']}
+    lost = sorted(product_id for product_id in acknowledged if product_id not in recovered)
+    oldest_lost = max((killed_at - acknowledged[product_id] for product_id in lost), default=0.0)
+    print('%-7s %10d %10d %8d %16.0f' % (backend, len(acknowledged), len(recovered & set(acknowledged)),
+                                          len(lost), oldest_lost * 1000))
+
+    failures = []
+    if not acknowledged:
+        failures.append('%s: no add was acknowledged before the kill' % backend)
+    if backend == 'sql' and lost:
+        failures.append('sql: %d acknowledged adds were lost' % len(lost))
+    if backend == 'memory' and oldest_lost > args.flush_interval + args.slack:
+        failures.append('memory: lost an add acknowledged %.0f ms before the crash, outside the '
+                        '%.0f ms window' % (oldest_lost * 1000, (args.flush_interval + args.slack) * 1000))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='Cart durability across a crash.')
+    parser.add_argument('--backends', default='sql,memory')
+    parser.add_argument('--flush-interval', type=float, default=1.0)
+    parser.add_argument('--kill-after', type=float, default=3.3, help='seconds of adds before SIGKILL')
+    parser.add_argument('--slack', type=float, default=0.5,
+                        help='seconds allowed on top of the flush interval for the flush itself')
+    parser.add_argument('--products', type=int, default=200000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cart-crash-')
+    print('%-7s %10s %10s %8s %16s' % ('backend', 'acked', 'recovered', 'lost', 'oldest lost ms'))
+    failures = []
+    for backend in args.backends.split(','):
+        failures.extend(run(backend, args, workdir))
+    if failures:
+        for failure in failures:
+            print('FAIL: ' + failure)
+        sys.exit(1)
+    print('OK: losses stay within the durability window')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+# backend/bench/checkout_stress.py
+# Concurrency stress test for checkout: hundreds of buyers check out carts
+# holding the same scarce product at the same moment, from several processes
+# (each with its own connection pool) and many threads per process. Fails
+# with a non-zero exit status if stock was oversold or the books don't add up.
+#
+#   python bench/checkout_stress.py [--buyers 400] [--stock 150] [--processes 8]
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+SECRET_KEY = 'checkout-stress-secret-key-not-for-production'
+
+def configure(database):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + database
+    os.environ['SECRET_KEY'] = SECRET_KEY
+    os.environ['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(database), 'uploads')
+    # This checks the books, not admission control: let every checkout in.
+    os.environ['RATE_LIMIT_ENABLED'] = '0'
+
+def token_for(user_id):
+    import jwt
+    return jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                      SECRET_KEY, algorithm='HS256')
+
+def setup(buyers, stock, seed):
+    """Create the database: one hot product, one untracked product, full carts."""
+    from app import create_app, db
+    from app.models import CartItem, Product, User
+    from app.schema import init_db
+
+    rng = random.Random(seed)
+    app = create_app()
+    with app.app_context():
+        init_db()
+        hot = Product(name='hot item', price=10.0, image='', stock=stock)
+        untracked = Product(name='untracked item', price=2.5, image='')
+        db.session.add_all([hot, untracked])
+        db.session.flush()
+        demand = 0
+        for number in range(buyers):
+            user = User(name='buyer %d' % number, email='buyer%d@stress.local' % number,
+                        password='x', is_admin=False)
+            db.session.add(user)
+            db.session.flush()
+            quantity = rng.randint(1, 3)
+            demand += quantity
+            db.session.add(CartItem(user_id=user.id, product_id=hot.id, quantity=quantity))
+            if rng.random() < 0.5:
+                db.session.add(CartItem(user_id=user.id, product_id=untracked.id, quantity=1))
+        db.session.commit()
+        user_ids = [user.id for user in User.query.order_by(User.id)]
+        return hot.id, user_ids, demand
+
+def buyer_process(database, user_ids, threads, start, results):
+    configure(database)
+    from app import create_app
+    app = create_app()
+
+    def checkout(user_id):
+        client = app.test_client()
+        response = client.post('/api/checkout', headers={'Authorization': 'Bearer ' + token_for(user_id)})
+        return user_id, response.status_code, response.get_json()
+
+    # Warm up imports and the pool before everyone starts together.
+    with app.test_client() as client:
+        client.get('/api/orders', headers={'Authorization': 'Bearer ' + token_for(user_ids[0])})
+    start.wait()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results.extend(list(pool.map(checkout, user_ids)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Checkout concurrency stress test.')
+    parser.add_argument('--buyers', type=int, default=400)
+    parser.add_argument('--stock', type=int, default=150)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=25, help='concurrent checkouts per process')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='checkout-stress-')
+    database = os.path.join(workdir, 'stress.db')
+    configure(database)
+    hot_id, user_ids, demand = setup(args.buyers, args.stock, args.seed)
+    print('%d buyers want %d units of a product with %d in stock' % (args.buyers, demand, args.stock))
+
+    context = multiprocessing.get_context('spawn')
+    manager = context.Manager()
+    start = manager.Event()
+    results = manager.list()
+    shares = [user_ids[i::args.processes] for i in range(args.processes)]
+    processes = [context.Process(target=buyer_process,
+                                 args=(database, share, args.threads, start, results))
+                 for share in shares]
+    for process in processes:
+        process.start()
+    threading.Event().wait(3)  # let every process build its app and connect
+    start.set()
+    for process in processes:
+        process.join()
+    results = list(results)
+
+    import sqlite3
+    connection = sqlite3.connect(database)
+    final_stock = connection.execute('SELECT stock FROM product WHERE id = ?', (hot_id,)).fetchone()[0]
+    sold = connection.execute(
+        'SELECT COALESCE(SUM(quantity), 0) FROM order_item WHERE product_id = ?', (hot_id,)).fetchone()[0]
+    orders = connection.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+    leftover_hot = connection.execute(
+        'SELECT COUNT(*) FROM cart_item JOIN orders ON orders.user_id = cart_item.user_id '
+        'WHERE cart_item.product_id = ?', (hot_id,)).fetchone()[0]
+
+    statuses = {}
+    for _, status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print('responses: %s' % ', '.join('%d x %d' % (count, status)
+                                      for status, count in sorted(statuses.items())))
+    print('sold %d, stock left %d, %d orders' % (sold, final_stock, orders))
+
+    failures = []
+    if len(results) != args.buyers:
+        failures.append('expected %d responses, got %d' % (args.buyers, len(results)))
+    if final_stock < 0:
+        failures.append('stock went negative: %d' % final_stock)
+    if sold + final_stock != args.stock:
+        failures.append('sold %d + left %d != initial %d' % (sold, final_stock, args.stock))
+    if statuses.get(201, 0) != orders:
+        failures.append('%d successful checkouts but %d orders' % (statuses.get(201, 0), orders))
+    if set(statuses) - {201, 409}:
+        failures.append('unexpected statuses: %s' % sorted(set(statuses) - {201, 409}))
+    if any(status == 409 and body.get('product_id') != hot_id for _, status, body in results):
+        failures.append('a checkout was refused for a product other than the scarce one')
+    if leftover_hot:
+        failures.append('%d buyers with an order still have the product in their cart' % leftover_hot)
+    if demand > args.stock and sold == 0:
+        failures.append('nothing was sold')
+
+    if failures:
+        for failure in failures:
+            print('FAIL: ' + failure)
+        sys.exit(1)
+    print('OK: no overselling')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# backend/bench/listing_memory.py
+# Time to first byte and peak memory of GET /api/cart as the cart grows,
+# streamed (what the endpoint does) against building the whole document
+# first (cart_contents() + jsonify, as it used to). Streaming should stay
+# flat; buffering grows with the cart.
+#
+#   python bench/listing_memory.py [--sizes 1000,10000,100000]
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+SECRET_KEY = 'listing-memory-secret-key-not-for-production'
+
+def measure(app, environ_overrides, user_id, buffered):
+    from flask import jsonify
+    from app.cart import cart_contents
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with app.test_request_context('/api/cart', **environ_overrides):
+        if buffered:
+            response = jsonify(cart_contents(user_id))
+        else:
+            from app.cart import cart_response
+            response = cart_response(user_id)
+        chunks = iter(response.response)
+        first = next(chunks)
+        ttfb = time.perf_counter() - started
+        size = len(first) + sum(len(chunk) for chunk in chunks)
+        response.close()
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return ttfb * 1000, total * 1000, peak / 2**20, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    database = os.path.join(tempfile.mkdtemp(prefix='listing-memory-'), 'bench.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + database
+    os.environ['SECRET_KEY'] = SECRET_KEY
+    from app import create_app
+    from app.schema import init_db
+    app = create_app()
+    with app.app_context():
+        init_db()
+
+    connection = sqlite3.connect(database)
+    now = datetime(2024, 1, 1)
+    connection.executemany(
+        'INSERT INTO product (name, price, image, created_at) VALUES (?, ?, ?, ?)',
+        (('product %d' % i, 1.5 + i % 100, '/uploads/%032x.png' % i, now + timedelta(seconds=i))
+         for i in range(max(sizes))))
+    connection.commit()
+
+    print('%10s  %-9s %10s %10s %12s %10s' % ('cart size', 'mode', 'ttfb ms', 'total ms', 'peak MiB', 'bytes'))
+    for user_id, size in enumerate(sizes, 1):
+        connection.execute("INSERT INTO user (id, name, email, password, is_admin) VALUES (?, ?, ?, 'x', 0)",
+                           (user_id, 'user %d' % user_id, 'user%d@bench.local' % user_id))
+        connection.executemany(
+            'INSERT INTO cart_item (user_id, product_id, quantity, created_at) VALUES (?, ?, 1, ?)',
+            ((user_id, product_id, now) for product_id in range(1, size + 1)))
+        connection.commit()
+        for buffered in (False, True):
+            ttfb, total, peak, length = measure(app, {}, user_id, buffered)
+            print('%10d  %-9s %10.1f %10.1f %12.1f %10d' % (
+                size, 'buffered' if buffered else 'streamed', ttfb, total, peak, length))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,611 @@
+# backend/bench/loadtest.py
+# Load and latency benchmark for the API.
+#
+#   python bench/loadtest.py seed                  # build bench/data/seed.db once
+#   python bench/loadtest.py run -o before.json    # seed if needed, start a server, drive it
+#   python bench/loadtest.py compare before.json after.json
+#
+# The dataset is generated from a fixed random seed, and every run starts
+# from a fresh copy of the seeded database, so two runs on the same machine
+# measure the same work. `--scale 0.01` gives a quick smaller dataset.
+import argparse
+import hashlib
+import http.client
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_DIR = os.path.join(BACKEND_DIR, 'bench', 'data')
+SEED_DB = os.path.join(DATA_DIR, 'seed.db')
+RUN_DB = os.path.join(DATA_DIR, 'run.db')
+
+SECRET_KEY = 'bench-secret-key-used-only-for-load-tests'
+PASSWORD = 'bench-password'
+DEFAULT_PRODUCTS = 1000000
+DEFAULT_USERS = 100000
+DEFAULT_CART_ITEMS = 5000000
+SEED_BATCH = 50000
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+ADJECTIVES = ('red', 'blue', 'green', 'black', 'white', 'vintage', 'classic', 'compact',
+              'deluxe', 'organic', 'wireless', 'portable', 'premium', 'rustic', 'smart')
+MATERIALS = ('cotton', 'leather', 'steel', 'bamboo', 'ceramic', 'wool', 'glass', 'oak',
+             'silk', 'carbon')
+NOUNS = ('chair', 'lamp', 'backpack', 'mug', 'jacket', 'speaker', 'table', 'notebook',
+         'bottle', 'watch', 'blanket', 'kettle', 'headphones', 'wallet', 'sneakers')
+
+# Seeding
+
+def product_name(rng, number):
+    return '%s %s %s %d' % (rng.choice(ADJECTIVES), rng.choice(MATERIALS), rng.choice(NOUNS), number)
+
+def seed(products, users, cart_items, path=SEED_DB, random_seed=42):
+    """Create the schema with init_db() and bulk-load a synthetic dataset."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + path, SECRET_KEY=SECRET_KEY)
+
+    def init_db():
+        subprocess.run([sys.executable, '-m', 'flask', 'init-db'], cwd=BACKEND_DIR, check=True,
+                       env=dict(env, FLASK_APP='wsgi.py'), stdout=subprocess.DEVNULL)
+
+    init_db()
+
+    sys.path.insert(0, BACKEND_DIR)
+    from werkzeug.security import generate_password_hash
+    from app.config import Config
+    # One hash for everyone: hashing 100k passwords would take hours.
+    password_hash = generate_password_hash(PASSWORD, Config.PASSWORD_HASH_METHOD)
+
+    rng = random.Random(random_seed)
+    started = datetime(2024, 1, 1)
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA synchronous = OFF')
+
+    def batches(rows):
+        while True:
+            batch = list(itertools.islice(rows, SEED_BATCH))
+            if not batch:
+                return
+            yield batch
+
+    for batch in batches((product_name(rng, i), round(rng.uniform(1, 500), 2), '',
+                          started + timedelta(seconds=i * 7)) for i in range(1, products + 1)):
+        connection.executemany(
+            'INSERT INTO product (name, price, image, created_at) VALUES (?, ?, ?, ?)', batch)
+        connection.commit()
+
+    for batch in batches(('user %d' % i, 'user%d@bench.local' % i, password_hash, i == 1)
+                         for i in range(1, users + 1)):
+        connection.executemany(
+            'INSERT INTO user (name, email, password, is_admin) VALUES (?, ?, ?, ?)', batch)
+        connection.commit()
+
+    def cart_rows():
+        per_user, extra = divmod(cart_items, users)
+        for user_id in range(1, users + 1):
+            count = min(per_user + (1 if user_id <= extra else 0), products)
+            for product_id in rng.sample(range(1, products + 1), count):
+                yield user_id, product_id, rng.randint(1, 3), started
+
+    # Pairing carts row by row in the triggers is far slower than one
+    # rebuild; init-db recreates the triggers and rebuilds below.
+    connection.execute('DROP TRIGGER cart_pairs_ai')
+    connection.execute('DROP TRIGGER cart_pairs_ad')
+    for batch in batches(cart_rows()):
+        connection.executemany(
+            'INSERT INTO cart_item (user_id, product_id, quantity, created_at) VALUES (?, ?, ?, ?)',
+            batch)
+        connection.commit()
+
+    connection.execute('ANALYZE')
+    connection.commit()
+    connection.close()
+    init_db()
+    with open(path + '.json', 'w') as f:
+        json.dump({'products': products, 'users': users, 'cart_items': cart_items,
+                   'random_seed': random_seed}, f)
+
+def seeded_dataset(path=SEED_DB):
+    try:
+        with open(path + '.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# Server
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(port, workers, threads, product_index=False):
+    """Serve bench.server:app on a fresh copy of the seeded database."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(RUN_DB + suffix):
+            os.remove(RUN_DB + suffix)
+    shutil.copyfile(SEED_DB, RUN_DB)
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + RUN_DB, SECRET_KEY=SECRET_KEY,
+               BIND='127.0.0.1:%d' % port, WEB_CONCURRENCY=str(workers),
+               WEB_THREADS=str(threads), UPLOAD_FOLDER=os.path.join(DATA_DIR, 'uploads'),
+               PRODUCT_INDEX_ENABLED='1' if product_index else '0')
+    try:
+        import gunicorn  # noqa: F401
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'bench.server:app']
+        server = 'gunicorn'
+    except ImportError:
+        command = [sys.executable, 'bench/server.py']
+        server = 'werkzeug'
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Server exited with status %d' % process.returncode)
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, server
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('Server did not start listening on port %d' % port)
+
+# Load generation
+
+class Client:
+    """One keep-alive connection per worker thread."""
+
+    def __init__(self, port):
+        self.port = port
+        self.connection = None
+
+    def request(self, method, path, body=None, headers=None):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        try:
+            self.connection.request(method, path, body=body, headers=headers or {})
+            response = self.connection.getresponse()
+            payload = response.read()
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            self.connection = None
+            raise
+        return response.status, response.getheader('X-Query-Count'), payload
+
+def token_for(user_id):
+    import jwt
+    return jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(days=1)},
+                      SECRET_KEY, algorithm='HS256')
+
+def png_bytes(number):
+    from PIL import Image
+    image = Image.new('RGB', (400, 300), ((number * 37) % 256, (number * 91) % 256, number % 256))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def multipart(field, filename, content, content_type):
+    boundary = 'bench%016x' % random.getrandbits(64)
+    body = b''.join([
+        b'--%s\r\n' % boundary.encode(),
+        b'Content-Disposition: form-data; name="%s"; filename="%s"\r\n' % (
+            field.encode(), filename.encode()),
+        b'Content-Type: %s\r\n\r\n' % content_type.encode(),
+        content,
+        b'\r\n--%s--\r\n' % boundary.encode(),
+    ])
+    return body, 'multipart/form-data; boundary=%s' % boundary
+
+def build_scenarios(dataset):
+    """Route name -> (share of --requests, request factory).
+
+    A factory gets (rng, worker state) and returns (method, path, body, headers).
+    Factories for routes that need something to exist first (a cart to check
+    out, an upload session to write to) set it up through state['call'],
+    which sends a request on the worker's connection without timing it.
+    Mutating routes only touch rows the run creates or can spare: every run
+    starts from a fresh copy of the seeded database.
+    """
+    products, users = dataset['products'], dataset['users']
+    new_ids = itertools.count(1)
+    deleted_ids = itertools.count(products, -1)
+    json_headers = {'Content-Type': 'application/json'}
+
+    def as_json(method, path, payload, state, admin=False):
+        headers = dict(json_headers, Authorization=state['admin' if admin else 'user'])
+        return method, path, json.dumps(payload), headers
+
+    def get(path, state, admin=False):
+        return 'GET', path, None, {'Authorization': state['admin' if admin else 'user']}
+
+    def register(rng, state):
+        number = next(new_ids)
+        return 'POST', '/api/auth/register', json.dumps({
+            'name': 'new %d' % number, 'email': 'new%d-%d@bench.local' % (os.getpid(), number),
+            'password': PASSWORD}), json_headers
+
+    def login(rng, state):
+        return 'POST', '/api/auth/login', json.dumps({
+            'email': 'user%d@bench.local' % rng.randint(1, users), 'password': PASSWORD
+        }), json_headers
+
+    def list_products(rng, state):
+        return get('/api/products', state)
+
+    def list_products_filtered(rng, state):
+        low = rng.randint(1, 400)
+        return get('/api/products?sort=%s&min_price=%d&max_price=%d&limit=20' % (
+            rng.choice(('newest', 'oldest', 'price_asc', 'price_desc')), low, low + 50), state)
+
+    def facets(rng, state):
+        return get('/api/products/facets', state)
+
+    def related(rng, state):
+        return get('/api/products/%d/related' % rng.randint(1, products), state)
+
+    def search(rng, state):
+        return get('/api/products/search?q=%s+%s' % (rng.choice(MATERIALS), rng.choice(NOUNS)), state)
+
+    def suggest(rng, state):
+        return get('/api/products/suggest?q=%s' % rng.choice(NOUNS)[:3], state)
+
+    def add_product(rng, state):
+        return as_json('POST', '/api/products', {
+            'name': product_name(rng, products + next(new_ids)), 'price': rng.randint(1, 500)
+        }, state, admin=True)
+
+    def update_product(rng, state):
+        return as_json('PUT', '/api/products/%d' % rng.randint(1, products // 2),
+                       {'price': rng.randint(1, 500)}, state, admin=True)
+
+    def delete_product(rng, state):
+        return 'DELETE', '/api/products/%d' % next(deleted_ids), None, {'Authorization': state['admin']}
+
+    def import_products(rng, state):
+        rows = [{'name': product_name(rng, i), 'price': rng.randint(1, 500)} for i in range(100)]
+        # Well-formed JSON with the wrong types; these come back as per-row errors.
+        rows[rng.randrange(100)] = {'name': rng.randint(1, 500), 'price': 1}
+        rows[rng.randrange(100)] = {'name': product_name(rng, 0), 'price': 1, 'image': 3}
+        body = ''.join(json.dumps(row) + '\n' for row in rows)
+        return 'POST', '/api/products/import', body, {
+            'Authorization': state['admin'], 'Content-Type': 'application/x-ndjson'}
+
+    def export_products(rng, state):
+        return get('/api/products/export', state, admin=True)
+
+    def get_cart(rng, state):
+        return get('/api/cart', state)
+
+    def add_to_cart(rng, state):
+        return as_json('POST', '/api/cart', {'product_id': rng.randint(1, products)}, state)
+
+    def batch_cart(rng, state):
+        return as_json('POST', '/api/cart/batch', {'operations': [
+            {'op': 'add', 'product_id': rng.randint(1, products), 'quantity': 1} for _ in range(5)
+        ]}, state)
+
+    def set_cart_quantity(rng, state):
+        # 404 when the product is not in this cart; that is part of the mix.
+        return as_json('PUT', '/api/cart/%d' % rng.randint(1, products),
+                       {'quantity': rng.randint(1, 5)}, state)
+
+    def remove_from_cart(rng, state):
+        return 'DELETE', '/api/cart/%d' % rng.randint(1, products), None, {'Authorization': state['user']}
+
+    def checkout(rng, state):
+        # The upper half of the ids may have been deleted by products_delete.
+        state['call']('POST', '/api/cart', json.dumps({'product_id': rng.randint(1, products // 2)}),
+                      dict(json_headers, Authorization=state['user']))
+        return 'POST', '/api/checkout', None, {'Authorization': state['user']}
+
+    def list_orders(rng, state):
+        return get('/api/orders?limit=20', state)
+
+    def bulk_update(rng, state):
+        # Products added by products_add and products_import; the seeded ones stay put.
+        return as_json('POST', '/api/products/bulk-update', {
+            'filter': {'ids': [products + rng.randint(1, 100) for _ in range(20)]},
+            'update': {'price': rng.randint(1, 500)}
+        }, state, admin=True)
+
+    def upload_session(state, size=UPLOAD_CHUNK_SIZE):
+        """Start a chunked upload (untimed); return its id."""
+        status, _, payload = state['call']('POST', '/api/uploads', json.dumps({
+            'filename': 'bench.mp4', 'size': size}), dict(json_headers, Authorization=state['admin']))
+        if status != 201:
+            raise RuntimeError('Starting an upload failed with status %d' % status)
+        return json.loads(payload)['id']
+
+    def put_chunk(upload_id, content, state):
+        return 'PUT', '/api/uploads/%s?offset=0' % upload_id, content, {
+            'Authorization': state['admin'], 'Content-Type': 'application/octet-stream'}
+
+    def start_upload(rng, state):
+        return as_json('POST', '/api/uploads', {'filename': 'bench.mp4', 'size': UPLOAD_CHUNK_SIZE * 4},
+                       state, admin=True)
+
+    def upload_status(rng, state):
+        return get('/api/uploads/%s' % upload_session(state), state, admin=True)
+
+    def upload_chunk(rng, state):
+        return put_chunk(upload_session(state), rng.randbytes(UPLOAD_CHUNK_SIZE), state)
+
+    def complete_upload(rng, state):
+        upload_id, content = upload_session(state), rng.randbytes(UPLOAD_CHUNK_SIZE)
+        state['call'](*put_chunk(upload_id, content, state))
+        return as_json('POST', '/api/uploads/%s/complete' % upload_id,
+                       {'sha256': hashlib.sha256(content).hexdigest()}, state, admin=True)
+
+    def cancel_upload(rng, state):
+        return 'DELETE', '/api/uploads/%s' % upload_session(state), None, {'Authorization': state['admin']}
+
+    def upload(rng, state):
+        body, content_type = multipart('file', 'bench.png', png_bytes(next(new_ids)), 'image/png')
+        return 'POST', '/api/upload', body, {'Authorization': state['admin'], 'Content-Type': content_type}
+
+    def auth_cache_stats(rng, state):
+        return get('/api/admin/auth-cache', state, admin=True)
+
+    def maintenance_status(rng, state):
+        return get('/api/admin/maintenance', state, admin=True)
+
+    def run_maintenance(rng, state):
+        # 409 while the previous run is still going.
+        return 'POST', '/api/admin/maintenance/checkpoint', None, {'Authorization': state['admin']}
+
+    def product_index_status(rng, state):
+        return get('/api/admin/product-index', state, admin=True)
+
+    def check_product_index(rng, state):
+        # 409 unless the run was started with --product-index.
+        return 'POST', '/api/admin/product-index/check', None, {'Authorization': state['admin']}
+
+    def related_status(rng, state):
+        return get('/api/admin/related', state, admin=True)
+
+    def rebuild_related(rng, state):
+        # One rebuild runs at a time; the rest get 409.
+        return 'POST', '/api/admin/related/rebuild', None, {'Authorization': state['admin']}
+
+    return {
+        'auth_register': (0.01, register),
+        'auth_login': (0.02, login),
+        'products_list': (1.0, list_products),
+        'products_list_filtered': (1.0, list_products_filtered),
+        'products_facets': (0.5, facets),
+        'products_related': (0.5, related),
+        'products_search': (0.5, search),
+        'products_suggest': (0.5, suggest),
+        'products_add': (0.1, add_product),
+        'products_update': (0.1, update_product),
+        'products_delete': (0.05, delete_product),
+        'products_import': (0.01, import_products),
+        'products_export': (0.0005, export_products),
+        'cart_get': (1.0, get_cart),
+        'cart_add': (0.5, add_to_cart),
+        'cart_batch': (0.2, batch_cart),
+        'cart_set_quantity': (0.2, set_cart_quantity),
+        'cart_remove': (0.2, remove_from_cart),
+        # Empties the carts, so it comes after the other cart routes.
+        'checkout': (0.05, checkout),
+        'orders_list': (0.2, list_orders),
+        'products_bulk_update': (0.01, bulk_update),
+        'upload': (0.01, upload),
+        'uploads_start': (0.01, start_upload),
+        'uploads_status': (0.01, upload_status),
+        'uploads_chunk': (0.01, upload_chunk),
+        'uploads_complete': (0.01, complete_upload),
+        'uploads_cancel': (0.01, cancel_upload),
+        'admin_auth_cache': (0.1, auth_cache_stats),
+        'admin_maintenance': (0.01, maintenance_status),
+        'admin_maintenance_run': (0.001, run_maintenance),
+        'admin_product_index': (0.01, product_index_status),
+        'admin_product_index_check': (0.001, check_product_index),
+        'admin_related': (0.01, related_status),
+        # Last: the rebuild goes on in the background after the request returns.
+        'admin_related_rebuild': (0.001, rebuild_related),
+    }
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run_scenario(port, factory, total, concurrency, users, random_seed):
+    local = threading.local()
+    counter = itertools.count()
+    samples = []
+    samples_lock = threading.Lock()
+
+    def worker_state():
+        if not hasattr(local, 'client'):
+            worker = next(counter)
+            local.client = Client(port)
+            # Worker n draws the same sequence in every scenario, so the
+            # set/remove cart phases mostly hit products cart_add put there.
+            local.rng = random.Random(random_seed * 1000 + worker)
+            local.state = {
+                'user': 'Bearer ' + token_for(2 + worker % max(1, users - 1)),
+                'admin': 'Bearer ' + token_for(1),
+                'call': local.client.request,
+            }
+        return local
+
+    def one(_):
+        worker = worker_state()
+        method, path, body, headers = factory(worker.rng, worker.state)
+        started = time.perf_counter()
+        try:
+            status, queries, _ = worker.client.request(method, path, body, headers)
+        except (http.client.HTTPException, OSError):
+            status, queries = None, None
+        elapsed = time.perf_counter() - started
+        with samples_lock:
+            samples.append((elapsed, status, queries))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+    queries = [int(q) for _, _, q in samples if q is not None]
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': total,
+        'errors': sum(1 for _, status, _ in samples if status is None or status >= 500),
+        'statuses': statuses,
+        'seconds': round(wall, 3),
+        'throughput_rps': round(total / wall, 1) if wall else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 2),
+            'p95': round(percentile(latencies, 0.95), 2),
+            'p99': round(percentile(latencies, 0.99), 2),
+            'max': round(latencies[-1], 2),
+        },
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    dataset = seeded_dataset()
+    wanted = {'products': int(DEFAULT_PRODUCTS * args.scale), 'users': int(DEFAULT_USERS * args.scale),
+              'cart_items': int(DEFAULT_CART_ITEMS * args.scale), 'random_seed': args.seed}
+    if dataset != wanted:
+        print('Seeding %(products)d products, %(users)d users, %(cart_items)d cart items...' % wanted)
+        seed(wanted['products'], wanted['users'], wanted['cart_items'], random_seed=args.seed)
+        dataset = wanted
+
+    scenarios = build_scenarios(dataset)
+    selected = args.routes.split(',') if args.routes else list(scenarios)
+    unknown = set(selected) - set(scenarios)
+    if unknown:
+        raise SystemExit('Unknown routes: %s' % ', '.join(sorted(unknown)))
+
+    port = free_port()
+    process, server = start_server(port, args.workers, args.threads, args.product_index)
+    results = {}
+    try:
+        for name in selected:
+            share, factory = scenarios[name]
+            total = max(args.min_requests, int(args.requests * share))
+            results[name] = run_scenario(port, factory, total, args.concurrency,
+                                         dataset['users'], args.seed)
+            latency = results[name]['latency_ms']
+            print('%-24s %7.1f req/s  p50 %8.2f  p95 %8.2f  p99 %8.2f ms  %5s queries' % (
+                name, results[name]['throughput_rps'], latency['p50'], latency['p95'],
+                latency['p99'], results[name]['queries_per_request']))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    report = {
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'server': {'kind': server, 'workers': args.workers, 'threads': args.threads,
+                   'product_index': args.product_index},
+        'dataset': dataset,
+        'load': {'requests': args.requests, 'concurrency': args.concurrency},
+        'routes': results,
+    }
+    output = args.output or os.path.join(
+        BACKEND_DIR, 'bench', 'results', datetime.utcnow().strftime('%Y%m%dT%H%M%SZ.json'))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Wrote %s' % output)
+
+def compare(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    if before['dataset'] != after['dataset']:
+        print('warning: the two runs used different datasets', file=sys.stderr)
+
+    def change(old, new):
+        if old in (None, 0) or new is None:
+            return '      n/a'
+        return '%+8.1f%%' % ((new - old) * 100.0 / old)
+
+    print('%-24s %10s %10s %10s %10s' % ('route', 'req/s', 'p50', 'p95', 'p99'))
+    for name, new in after['routes'].items():
+        old = before['routes'].get(name)
+        if old is None:
+            continue
+        print('%-24s %10s %10s %10s %10s' % (
+            name, change(old['throughput_rps'], new['throughput_rps']),
+            change(old['latency_ms']['p50'], new['latency_ms']['p50']),
+            change(old['latency_ms']['p95'], new['latency_ms']['p95']),
+            change(old['latency_ms']['p99'], new['latency_ms']['p99'])))
+
+def main():
+    parser = argparse.ArgumentParser(description='Load and latency benchmark for the API.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_dataset_options(command):
+        command.add_argument('--scale', type=float, default=1.0,
+                             help='fraction of the full 1M products / 100k users / 5M cart items')
+        command.add_argument('--seed', type=int, default=42, help='random seed for data and load')
+
+    seed_command = commands.add_parser('seed', help='(re)build the seeded database')
+    add_dataset_options(seed_command)
+
+    run_command = commands.add_parser('run', help='drive every /api route and record results')
+    add_dataset_options(run_command)
+    run_command.add_argument('--requests', type=int, default=5000,
+                             help='requests for a route with share 1.0; others are scaled down')
+    run_command.add_argument('--min-requests', type=int, default=5,
+                             help='lower bound on the requests sent to any route')
+    run_command.add_argument('--concurrency', type=int, default=16)
+    run_command.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    run_command.add_argument('--threads', type=int, default=4, help='threads per worker')
+    run_command.add_argument('--product-index', action='store_true',
+                             help='serve product lists from the in-memory index (PRODUCT_INDEX_ENABLED=1)')
+    run_command.add_argument('--routes', help='comma-separated subset of routes to run')
+    run_command.add_argument('-o', '--output', help='results file (default bench/results/<time>.json)')
+
+    compare_command = commands.add_parser('compare', help='show the change between two result files')
+    compare_command.add_argument('before')
+    compare_command.add_argument('after')
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        seed(int(DEFAULT_PRODUCTS * args.scale), int(DEFAULT_USERS * args.scale),
+             int(DEFAULT_CART_ITEMS * args.scale), random_seed=args.seed)
+    elif args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+if __name__ == '__main__':
+    main()
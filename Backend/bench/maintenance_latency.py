@@ -0,0 +1,142 @@
+# backend/bench/maintenance_latency.py
+# Do the maintenance jobs get in the way of requests? Seeds a database with
+# abandoned carts, then commits one cart line at a time on another
+# connection (as a request would) first alone and then while the jobs
+# run, and compares the commit latencies. Exits non-zero if a commit
+# waited longer than --max-write-ms during the jobs, if an abandoned cart
+# survived, or if a live cart lost a line.
+#
+#   python bench/maintenance_latency.py [--carts 5000] [--lines 20] [--max-write-ms 100]
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+os.environ['MAINTENANCE_ENABLED'] = '0'
+
+PRODUCTS = 1000
+JOB_ORDER = ('expire_carts', 'expire_uploads', 'incremental_vacuum', 'analyze', 'checkpoint')
+
+def seed(app, database, carts, lines):
+    from sqlalchemy import text
+    from app import db
+    from app.schema import init_db
+
+    with app.app_context():
+        init_db()
+        # Pairs are counted once at the end instead of on every insert.
+        db.session.execute(text('DROP TRIGGER cart_pairs_ai'))
+        db.session.execute(text('DROP TRIGGER cart_pairs_ad'))
+        db.session.commit()
+    connection = sqlite3.connect(database)
+    old = (datetime.utcnow() - timedelta(days=60)).strftime('%Y-%m-%d %H:%M:%S.%f')
+    connection.executemany("INSERT INTO user (id, name, email, password, is_admin) VALUES (?, 'u', ?, 'x', 0)",
+                           ((user_id, 'u%d@bench.local' % user_id) for user_id in range(1, carts + 2)))
+    connection.executemany('INSERT INTO product (name, price, image) VALUES (?, 1.0, ?)',
+                           (('product %d' % i, '') for i in range(PRODUCTS)))
+    connection.executemany('INSERT INTO cart_item (user_id, product_id, quantity, created_at) VALUES (?, ?, 1, ?)',
+                           ((user_id, (user_id * 7 + line) % PRODUCTS + 1, old)
+                            for user_id in range(1, carts + 1) for line in range(lines)))
+    connection.commit()
+    connection.close()
+    with app.app_context():
+        init_db()
+
+def commit_lines(database, user_id, stop, latencies):
+    """Add products to user_id's cart, one committed line at a time."""
+    connection = sqlite3.connect(database, isolation_level=None)
+    connection.execute('PRAGMA busy_timeout = 5000')
+    product_id = 0
+    while not stop.is_set():
+        product_id = product_id % PRODUCTS + 1
+        started = time.perf_counter()
+        connection.execute('BEGIN IMMEDIATE')
+        connection.execute('INSERT INTO cart_item (user_id, product_id, quantity, created_at) VALUES (?, ?, 1, ?)'
+                           ' ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = quantity + 1',
+                           (user_id, product_id, datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')))
+        connection.execute('COMMIT')
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.002)
+    connection.close()
+
+def measure(database, user_id, seconds=None, during=None):
+    stop, latencies = threading.Event(), []
+    writer = threading.Thread(target=commit_lines, args=(database, user_id, stop, latencies))
+    writer.start()
+    result = during() if during else time.sleep(seconds)
+    stop.set()
+    writer.join()
+    return latencies, result
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return '%7d commits  p50 %6.2f ms  p99 %6.2f ms  max %7.2f ms' % (
+        len(ordered), pick(0.5), pick(0.99), ordered[-1] * 1000)
+
+def main():
+    parser = argparse.ArgumentParser(description='Request write latency while maintenance jobs run.')
+    parser.add_argument('--carts', type=int, default=5000, help='abandoned carts to seed')
+    parser.add_argument('--lines', type=int, default=20, help='lines per abandoned cart')
+    parser.add_argument('--max-write-ms', type=float, default=100)
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.config import Config
+    from app.maintenance import run_due_jobs
+
+    workdir = tempfile.mkdtemp(prefix='maintenance-')
+    database = os.path.join(workdir, 'maintenance.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + database
+        UPLOAD_FOLDER = os.path.join(workdir, 'uploads')
+
+    app = create_app(BenchConfig)
+    started = time.perf_counter()
+    seed(app, database, args.carts, args.lines)
+    print('seeded %d abandoned cart lines in %.1fs' % (args.carts * args.lines, time.perf_counter() - started))
+    live_user = args.carts + 1
+
+    baseline, _ = measure(database, live_user, seconds=3)
+
+    def run_jobs():
+        with app.app_context():
+            return run_due_jobs(set(JOB_ORDER), force=True)
+
+    during, results = measure(database, live_user, during=run_jobs)
+    print('alone        ' + summary(baseline))
+    print('during jobs  ' + summary(during))
+    for result in results:
+        print('  %-18s %8d rows %8.3fs  longest write %6.1f ms%s' % (
+            result['job'], result['rows'], result['seconds'], result['longest_write'] * 1000,
+            '  failed: %s' % result['error'] if result['error'] else ''))
+
+    connection = sqlite3.connect(database)
+    abandoned = connection.execute('SELECT COUNT(*) FROM cart_item WHERE user_id != ?', (live_user,)).fetchone()[0]
+    live = connection.execute('SELECT COUNT(*) FROM cart_item WHERE user_id = ?', (live_user,)).fetchone()[0]
+    connection.close()
+    failures = []
+    if max(during) * 1000 > args.max_write_ms:
+        failures.append('a commit waited %.1f ms during the jobs' % (max(during) * 1000))
+    if abandoned:
+        failures.append('%d abandoned cart lines were left' % abandoned)
+    if live < min(PRODUCTS, len(baseline) + len(during)):
+        failures.append('the live cart has %d lines, expected %d'
+                        % (live, min(PRODUCTS, len(baseline) + len(during))))
+    failures.extend('%s failed: %s' % (result['job'], result['error']) for result in results if result['error'])
+    if failures:
+        for failure in failures:
+            print('FAIL: ' + failure)
+        sys.exit(1)
+    print('OK: abandoned carts expired without holding up commits')
+
+if __name__ == '__main__':
+    main()
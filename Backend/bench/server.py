@@ -0,0 +1,44 @@
+# backend/bench/server.py
+# The app as served during load tests: the normal create_app() plus an
+# X-Query-Count response header with the number of SQL statements the
+# request ran. Started by loadtest.py, either under gunicorn
+# (bench.server:app) or, when gunicorn is not installed, on Werkzeug.
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Load tests come from one address; set RATE_LIMIT_ENABLED=1 to measure with limits on.
+os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+# Background jobs would show up in the latency numbers.
+os.environ.setdefault('MAINTENANCE_ENABLED', '0')
+
+from sqlalchemy import event
+
+from app import create_app, db
+
+app = create_app()
+_statements = threading.local()
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    _statements.count = getattr(_statements, 'count', 0) + 1
+
+with app.app_context():
+    for engine in (db.get_engine(app), app.extensions['read_engine']):
+        event.listen(engine, 'before_cursor_execute', _count_statement)
+
+@app.before_request
+def reset_statement_count():
+    _statements.count = 0
+
+@app.after_request
+def add_statement_count(response):
+    # Streamed bodies (export) keep querying after this point; for those
+    # the header only covers the work done before the first chunk.
+    response.headers['X-Query-Count'] = str(getattr(_statements, 'count', 0))
+    return response
+
+if __name__ == '__main__':
+    from werkzeug.serving import run_simple
+    host, port = os.environ.get('BIND', '127.0.0.1:5000').rsplit(':', 1)
+    run_simple(host, int(port), app, threaded=True)
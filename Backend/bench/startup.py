@@ -0,0 +1,52 @@
+# backend/bench/startup.py
+# Cold-start time of the app: each run is a fresh interpreter that imports
+# the app package and calls create_app(), as a new worker would.
+#
+#   python bench/startup.py [--runs 20]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROBE = '''
+import time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+print(imported - started, app.extensions['startup_seconds'], time.perf_counter() - started)
+'''
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    samples = {'import': [], 'create_app': [], 'total': []}
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE], cwd=BACKEND_DIR, check=True,
+            capture_output=True, text=True
+        ).stdout.split()
+        for name, value in zip(samples, output):
+            samples[name].append(float(value) * 1000)
+
+    results = {name: {
+        'min_ms': round(min(values), 2),
+        'median_ms': round(statistics.median(values), 2),
+        'max_ms': round(max(values), 2),
+    } for name, values in samples.items()}
+    if args.json:
+        print(json.dumps({'runs': args.runs, 'results': results}))
+        return
+    for name, stats in results.items():
+        print('%-10s min %8.2f ms  median %8.2f ms  max %8.2f ms' % (
+            name, stats['min_ms'], stats['median_ms'], stats['max_ms']))
+
+if __name__ == '__main__':
+    main()
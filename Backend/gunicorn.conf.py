@@ -0,0 +1,27 @@
+# backend/gunicorn.conf.py
+# gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '127.0.0.1:5000')
+# Build the app once in the master; workers fork from it and share its
+# imported modules copy-on-write instead of each importing them again.
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks can't build up; the jitter
+# keeps them from all restarting at once.
+max_requests = int(os.environ.get('MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('MAX_REQUESTS_JITTER', 500))
+
+def on_starting(server):
+    # CART_BACKEND=memory keeps each cart in one process's memory; with more
+    # workers a user's requests land on different copies of their cart.
+    # Gunicorn reports a RuntimeError from here and exits before forking.
+    if os.environ.get('CART_BACKEND', 'sql') == 'memory' and server.cfg.workers > 1:
+        raise RuntimeError('CART_BACKEND=memory needs a single worker, not %d; '
+                           'set WEB_CONCURRENCY=1 and scale with WEB_THREADS' % server.cfg.workers)
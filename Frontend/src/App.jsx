@@ -7,6 +7,7 @@ import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from '@/components/ui/dialog';
 import { Badge } from '@/components/ui/badge';
+import { fetchAllProducts, fetchProductPage } from '@/services/api';
 
 
 // -------------------------
@@ -414,7 +415,10 @@ const ProductsView = React.memo(({
   setShowCart,
   handleLogout,
   addToCart,
-  updateQuantity
+  updateQuantity,
+  hasMoreProducts,
+  loadingMoreProducts,
+  loadMoreProducts
 }) => {
   return (
     <div className="min-h-screen flex flex-col bg-white">
@@ -445,6 +449,18 @@ const ProductsView = React.memo(({
             />
           ))}
         </div>
+
+        {hasMoreProducts && (
+          <div className="flex justify-center mt-8">
+            <Button
+              variant="outline"
+              onClick={loadMoreProducts}
+              disabled={loadingMoreProducts}
+            >
+              {loadingMoreProducts ? 'Loading...' : 'Load more'}
+            </Button>
+          </div>
+        )}
       </div>
       
       {/* Cart Sidebar */}
@@ -801,6 +817,9 @@ const App = () => {
     return token && savedUser ? JSON.parse(savedUser) : null;
   });
   const [products, setProducts] = useState([]);
+  // Cursor of the next page of the storefront list; null once it's all loaded.
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMoreProducts, setLoadingMoreProducts] = useState(false);
   const [cart, setCart] = useState([]);
   const [showCart, setShowCart] = useState(false);
   const [loginEmail, setLoginEmail] = useState('');
@@ -813,20 +832,21 @@ const App = () => {
 
   const navigate = useNavigate();
 
-  // Fetch products when user is available.
+  // Fetch products when user is available: the first page for shoppers, who
+  // load more as they go, and the whole catalog for admins, who edit it.
   useEffect(() => {
     const fetchProducts = async () => {
       try {
         const token = localStorage.getItem('token');
         if (!token) return;
-        const response = await fetch('http://localhost:5000/api/products', {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        });
-        if (response.ok) {
-          const data = await response.json();
-          setProducts(data);
+        const headers = { 'Authorization': `Bearer ${token}` };
+        if (user.isAdmin) {
+          setProducts(await fetchAllProducts({ headers }));
+          setNextCursor(null);
+        } else {
+          const data = await fetchProductPage({ headers });
+          setProducts(data.products);
+          setNextCursor(data.next_cursor);
         }
       } catch (error) {
         console.error('Error fetching products:', error);
@@ -837,6 +857,23 @@ const App = () => {
     }
   }, [user]);
 
+  const loadMoreProducts = async () => {
+    if (!nextCursor || loadingMoreProducts) return;
+    setLoadingMoreProducts(true);
+    try {
+      const data = await fetchProductPage({
+        cursor: nextCursor,
+        headers: { 'Authorization': `Bearer ${localStorage.getItem('token')}` }
+      });
+      setProducts(prev => [...prev, ...data.products]);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Error fetching products:', error);
+    } finally {
+      setLoadingMoreProducts(false);
+    }
+  };
+
   const handleLogin = async (e) => {
     e.preventDefault();
     setLoginError('');
@@ -873,6 +910,7 @@ const App = () => {
     setUser(null);
     setCart([]);
     setProducts([]);
+    setNextCursor(null);
     setLoginError('');
     navigate('/login');
   };
@@ -970,6 +1008,9 @@ const App = () => {
               handleLogout={handleLogout}
               addToCart={addToCart}
               updateQuantity={updateQuantity}
+              hasMoreProducts={Boolean(nextCursor)}
+              loadingMoreProducts={loadingMoreProducts}
+              loadMoreProducts={loadMoreProducts}
             />
           ) : (
             <Navigate to="/login" />
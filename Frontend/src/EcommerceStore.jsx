@@ -6,6 +6,7 @@ import { Card, CardContent, CardFooter, CardHeader, CardTitle } from '@/componen
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
+import { fetchAllProducts } from '@/services/api';
 
 const EcommerceStore = ({ adminToken, setAdminToken }) => {
   const [products, setProducts] = useState([]);
@@ -20,11 +21,13 @@ const EcommerceStore = ({ adminToken, setAdminToken }) => {
     fetchCartItems();
   }, []);
 
+  // The store edits products in place, so it keeps the whole catalog rather
+  // than the first page.
   const fetchProducts = async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/products');
-      const data = await response.json();
-      setProducts(data);
+      setProducts(await fetchAllProducts({
+        headers: adminToken ? { 'Authorization': adminToken } : undefined
+      }));
     } catch (error) {
       console.error('Error fetching products:', error);
     }
@@ -34,7 +37,7 @@ const EcommerceStore = ({ adminToken, setAdminToken }) => {
     try {
       const response = await fetch('http://localhost:5000/api/cart');
       const data = await response.json();
-      setCart(data);
+      setCart(data.items);
     } catch (error) {
       console.error('Error fetching cart items:', error);
     }
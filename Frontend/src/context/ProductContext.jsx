@@ -1,19 +1,22 @@
 // src/context/ProductContext.jsx
 import React, { createContext, useState, useEffect } from 'react';
+import { fetchProductPage } from '../services/api';
 
 export const ProductContext = createContext();
 
 export const ProductProvider = ({ children }) => {
   const [products, setProducts] = useState([]);
+  // Cursor of the next page; null once every product is loaded.
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
 
   const fetchProducts = async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/products');
-      if (!response.ok) throw new Error('Failed to fetch products');
-      const data = await response.json();
-      setProducts(data);
+      const data = await fetchProductPage();
+      setProducts(data.products);
+      setNextCursor(data.next_cursor);
       setError(null);
     } catch (err) {
       setError(err.message);
@@ -22,6 +25,20 @@ export const ProductProvider = ({ children }) => {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const data = await fetchProductPage({ cursor: nextCursor });
+      setProducts(prev => [...prev, ...data.products]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchProducts();
   }, []);
@@ -56,7 +73,10 @@ export const ProductProvider = ({ children }) => {
   };
 
   return (
-    <ProductContext.Provider value={{ products, loading, error, addProduct, deleteProduct }}>
+    <ProductContext.Provider value={{
+      products, loading, error, addProduct, deleteProduct,
+      hasMore: Boolean(nextCursor), loadingMore, loadMore
+    }}>
       {children}
     </ProductContext.Provider>
   );
@@ -1,12 +1,40 @@
 // src/services/api.js
 const API_URL = 'http://localhost:5000/api';
 
+// Largest page GET /api/products returns (MAX_PAGE_SIZE in app/catalog.py).
+export const MAX_PAGE_SIZE = 100;
+
 export const fetchProducts = async () => {
   const response = await fetch(`${API_URL}/products`);
   if (!response.ok) throw new Error('Failed to fetch products');
   return response.json();
 };
 
+// One page of products: { products, next_cursor }. Pass the previous page's
+// next_cursor to get the page after it; next_cursor is null on the last page.
+export const fetchProductPage = async ({ cursor, limit, headers } = {}) => {
+  const params = new URLSearchParams();
+  if (cursor) params.set('cursor', cursor);
+  if (limit) params.set('limit', limit);
+  const query = params.toString();
+  const response = await fetch(`${API_URL}/products${query ? `?${query}` : ''}`, { headers });
+  if (!response.ok) throw new Error('Failed to fetch products');
+  return response.json();
+};
+
+// The whole catalog, following next_cursor page by page (for admin views,
+// which edit the full list).
+export const fetchAllProducts = async ({ headers } = {}) => {
+  const products = [];
+  let cursor = null;
+  do {
+    const page = await fetchProductPage({ cursor, limit: MAX_PAGE_SIZE, headers });
+    products.push(...page.products);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return products;
+};
+
 export const createProduct = async (product) => {
   const response = await fetch(`${API_URL}/products`, {
     method: 'POST',